@@ -0,0 +1,84 @@
+# Run benchmarks and compare results:
+#   python -m benchmarks run --output results.json
+#   python -m benchmarks compare baseline.json results.json --threshold 0.1
+import argparse
+import sys
+import tempfile
+from typing import Dict, List, Optional
+
+from benchmarks import cases  # noqa: F401 registers benchmarks
+from benchmarks.runner import compare, dump, load, run
+
+
+def report(name: str, result: Dict) -> None:
+    print(
+        f"{name:<32} {result['seconds'] * 1000:>10.2f} ms "
+        f"{result['throughput'] / 2 ** 20:>9.1f} MiB/s "
+        f"{result['peak'] / 2 ** 20:>9.1f} MiB peak"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    run_parser = commands.add_parser("run", help="run benchmarks")
+    run_parser.add_argument("-o", "--output", help="write JSON results to file")
+    run_parser.add_argument("-r", "--repeat", type=int, default=5)
+    run_parser.add_argument(
+        "-k", dest="names", action="append", help="run benchmarks containing name"
+    )
+
+    compare_parser = commands.add_parser("compare", help="fail on regressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.1, help="allowed slowdown, 0.1 is 10%%"
+    )
+    compare_parser.add_argument(
+        "--memory-threshold", type=float, default=0.1, help="allowed peak increase"
+    )
+    compare_parser.add_argument(
+        "--allow-missing",
+        action="store_true",
+        help="do not fail on baseline benchmarks missing from current results",
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        with tempfile.TemporaryDirectory() as workdir:
+            results = run(workdir, args.names, args.repeat, report)
+
+        if args.output:
+            dump(results, args.output)
+        return 0
+
+    baseline, current = load(args.baseline), load(args.current)
+    regressions = compare(baseline, current, args.threshold, args.memory_threshold)
+    for name, metric, change in regressions:
+        print(f"{name:<32} {metric:<8} {change:+.1%}")
+
+    missing = sorted(set(baseline["results"]) - set(current["results"]))
+    for name in missing:
+        print(f"{name:<32} missing")
+
+    failed = False
+    if regressions:
+        print(f"{len(regressions)} regression(s) found.", file=sys.stderr)
+        failed = True
+
+    # renamed or dropped benchmarks would otherwise pass unnoticed
+    if missing and not args.allow_missing:
+        print(f"{len(missing)} benchmark(s) missing.", file=sys.stderr)
+        failed = True
+
+    if failed:
+        return 1
+
+    print("No regressions found.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import gzip
+import hashlib
+import io
+import tarfile
+from collections import deque
+from functools import lru_cache
+from os import path
+from typing import Any, Callable, Iterable, List, Tuple
+from zipfile import ZipFile
+
+import pycran
+from benchmarks.runner import case
+
+data_path = path.join(path.dirname(__file__), "..", "tests", "data")
+
+
+def consume(iterable: Iterable) -> None:
+    """Exhaust iterator without keeping its items"""
+    deque(iterable, maxlen=0)
+
+
+@lru_cache()
+def cran_index() -> bytes:
+    with ZipFile(path.join(data_path, "PACKAGES.txt.zip")) as archive:
+        with archive.open("PACKAGES.txt") as fp:
+            return fp.read()
+
+
+@lru_cache()
+def cran_records() -> List:
+    return list(pycran.parse(cran_index()))
+
+
+def words(seed: int, count: int) -> List[str]:
+    """Deterministic pseudo random words"""
+    digest = b""
+    result: List[str] = []
+    while len(result) < count:
+        digest = hashlib.sha256(digest + seed.to_bytes(4, "little")).digest()
+        result.extend(digest.hex()[i : i + 7] for i in range(0, 63, 9))
+
+    return result[:count]
+
+
+@lru_cache()
+def long_continuations() -> bytes:
+    """Few records having thousands of wrapped description lines"""
+    line = "        " + " ".join(words(1, 8))
+    records = []
+    for index in range(40):
+        lines = [f"Package: pkg{index}", "Version: 1.0", "Description: start"]
+        lines.extend([line] * 2500)
+        lines.append("License: GPL-3")
+        records.append("\n".join(lines))
+
+    return ("\n\n".join(records) + "\n").encode()
+
+
+@lru_cache()
+def many_fields() -> bytes:
+    """Records having hundreds of short fields"""
+    names = [f"Field{index}" for index in range(200)]
+    values = words(2, len(names))
+    records = []
+    for index in range(1500):
+        lines = [f"Package: pkg{index}"]
+        lines.extend(f"{name}: {value}" for name, value in zip(names, values))
+        records.append("\n".join(lines))
+
+    return ("\n\n".join(records) + "\n").encode()
+
+
+def package_tarball(filename: str, members: int, member_size: int) -> None:
+    """Write package tarball with `DESCRIPTION` after every other member"""
+    description = "\n".join(
+        f"{key}: {value}" for key, value in cran_records()[0].items()
+    ).encode()
+    with tarfile.open(filename, "w:gz") as tar:
+        for index in range(members + 1):
+            if index < members:
+                name = f"pkg/R/file{index}.R"
+                data = " ".join(words(index, member_size // 8)).encode()
+            else:
+                name, data = "pkg/DESCRIPTION", description
+
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def parse_case(data: Callable[[], Any], **options: Any) -> Callable[[str], Tuple]:
+    def setup(workdir: str) -> Tuple[Callable[[], Any], int]:
+        value = data()
+        return (lambda: consume(pycran.parse(value, **options))), len(value)
+
+    return setup
+
+
+case("parse/cran")(parse_case(cran_index))
+case("parse/cran-strict")(parse_case(cran_index, strict=True))
+case("parse/cran-text")(parse_case(lambda: cran_index().decode()))
+case("parse/cran-gzip")(parse_case(lambda: gzip.compress(cran_index())))
+case("parse/cran-compact")(parse_case(cran_index, compact=True))
+case("parse/cran-fields")(parse_case(cran_index, fields=["Package", "Version"]))
+case("parse/cran-strict-fields")(
+    parse_case(cran_index, strict=True, fields=["Package", "Version"])
+)
+case("parse/cran-where")(parse_case(cran_index, where={"NeedsCompilation": "yes"}))
+case("parse/long-continuations")(parse_case(long_continuations))
+case("parse/many-fields")(parse_case(many_fields))
+
+
+@case("parse/cran-lazy-projection")
+def parse_lazy_projection(workdir: str) -> Tuple[Callable[[], Any], int]:
+    data = cran_index()
+
+    def run() -> None:
+        for package in pycran.parse(data, lazy=True):
+            package["Package"], package["Version"]
+
+    return run, len(data)
+
+
+@case("parse/stream")
+def parse_stream(workdir: str) -> Tuple[Callable[[], Any], int]:
+    data = cran_index()
+    return (lambda: consume(pycran.parse_stream(io.BytesIO(data)))), len(data)
+
+
+@case("encode/roundtrip")
+def encode_roundtrip(workdir: str) -> Tuple[Callable[[], Any], int]:
+    records = cran_records()[:3000]
+
+    def run() -> None:
+        for record in records:
+            pycran.decode(pycran.encode(record) or "")
+
+    return run, sum(len(pycran.encode(record) or "") for record in records)
+
+
+@case("encode/many")
+def encode_many(workdir: str) -> Tuple[Callable[[], Any], int]:
+    records = cran_records()
+    return (lambda: pycran.encode_many(records, io.BytesIO())), len(cran_index())
+
+
+@case("from_file/bundled")
+def from_file_bundled(workdir: str) -> Tuple[Callable[[], Any], int]:
+    filename = path.join(data_path, "A3_1.0.0.tar.gz")
+    return (lambda: pycran.from_file(filename)), path.getsize(filename)
+
+
+@case("from_file/large-tarball")
+def from_file_large(workdir: str) -> Tuple[Callable[[], Any], int]:
+    filename = path.join(workdir, "pkg_1.0.tar.gz")
+    package_tarball(filename, members=400, member_size=32 * 1024)
+    return (lambda: pycran.from_file(filename)), path.getsize(filename)
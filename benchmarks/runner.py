@@ -0,0 +1,144 @@
+import gc
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import pycran
+
+# Benchmark setup gets a scratch directory and returns
+# the function to measure with the number of bytes it processes.
+Setup = Callable[[str], Tuple[Callable[[], Any], int]]
+
+CASES: Dict[str, Setup] = {}
+
+FORMAT_VERSION = 1
+
+
+def case(name: str) -> Callable[[Setup], Setup]:
+    """Register benchmark setup under the given name"""
+
+    def register(setup: Setup) -> Setup:
+        CASES[name] = setup
+        return setup
+
+    return register
+
+
+def measure(function: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Time function like `timeit` does with garbage collection disabled,
+    peak memory is measured by a separate traced run.
+
+    Args:
+        function (Callable[[], Any]): benchmark body
+        repeat (int): number of timed runs
+
+    Returns:
+        (Dict[str, float]): best and median run time and peak memory
+    """
+    function()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+    finally:
+        if enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": min(times), "median": statistics.median(times), "peak": peak}
+
+
+def run(
+    workdir: str,
+    names: Optional[Iterable[str]] = None,
+    repeat: int = 5,
+    report: Optional[Callable[[str, Dict], None]] = None,
+) -> Dict:
+    """Run benchmarks and collect results with the environment description
+    Args:
+        workdir (str): directory for generated data
+        names (Optional[Iterable[str]]): substrings selecting benchmarks
+        repeat (int): number of timed runs of every benchmark
+        report (Optional[Callable[[str, Dict], None]]): called with each result
+
+    Returns:
+        (Dict): results which can be dumped as JSON
+    """
+    patterns = list(names or [])
+    results = {}
+    for name, setup in sorted(CASES.items()):
+        if patterns and not any(pattern in name for pattern in patterns):
+            continue
+
+        function, size = setup(workdir)
+        result = measure(function, repeat)
+        result["size"] = size
+        result["throughput"] = size / result["seconds"]
+        results[name] = result
+        if report is not None:
+            report(name, result)
+
+    return {
+        "format": FORMAT_VERSION,
+        "pycran": pycran.__version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(
+    baseline: Dict, current: Dict, threshold: float, memory_threshold: float
+) -> List[Tuple[str, str, float]]:
+    """Find benchmarks which became slower or use more memory
+    Args:
+        baseline (Dict): earlier results
+        current (Dict): new results
+        threshold (float): allowed relative increase of the best run time
+        memory_threshold (float): allowed relative increase of peak memory
+
+    Returns:
+        (List[Tuple[str, str, float]]): benchmark, metric and relative change
+            of every regression
+    """
+    regressions = []
+    for name, result in sorted(current["results"].items()):
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+
+        for metric, limit in (("seconds", threshold), ("peak", memory_threshold)):
+            if before[metric] <= 0:
+                continue
+
+            change = result[metric] / before[metric] - 1
+            if change > limit:
+                regressions.append((name, metric, change))
+
+    return regressions
+
+
+def load(filename: str) -> Dict:
+    with open(filename) as fp:
+        return json.load(fp)
+
+
+def dump(results: Dict, filename: str) -> None:
+    with open(filename, "w") as fp:
+        json.dump(results, fp, indent=2, sort_keys=True)
+        fp.write("\n")
@@ -1,75 +1,162 @@
 """Parse CRAN package metadata"""
-from typing import Dict, Generator, Optional, Set
-
-from pycran.typings import BytesOrString, PathOrTarFile
-from pycran.util import as_string, read_description
+import mmap
+from typing import Any, Collection, Dict, Iterator, Mapping, Optional
+
+from pycran.compression import (
+    MAGIC_SIZE,
+    decompress,
+    detect_compression,
+    maybe_decompress,
+)
+from pycran.metrics import (
+    BYTES_READ,
+    DECOMPRESS,
+    ERRORS,
+    FROM_FILE,
+    count,
+    observers,
+    timed,
+    timer,
+)
+from pycran.parallel import parse_parallel
+from pycran.parser import parse_records
+from pycran.records import LazyRecord, PackageRecord
+from pycran.scanner import chunk_lines, parse_buffer, parse_lazy, stream_lines
+from pycran.table import PackageTable
+from pycran.typings import BytesOrString, Conditions, PathOrTarFile, StreamOrChunks
+from pycran.util import CHUNK_SIZE, iter_chunks, iter_lines, read_description
+from pycran.writer import encode_many, write_packages
 
 __version__ = "0.2.0"
 
 
-def parse(data: BytesOrString) -> Generator:
+def parse(
+    data: BytesOrString,
+    strict: bool = False,
+    compact: bool = False,
+    lazy: bool = False,
+    fields: Optional[Collection[str]] = None,
+    where: Optional[Conditions] = None,
+) -> Iterator:
     """Parses CRAN package metadata from
     https://cran.r-project.org/src/contrib/PACKAGES
     and returns the list of dictionaries.
 
-    Note: long whitespaces and new lines are stripped.
+    Note: long whitespaces and new lines are stripped,
+          gzip, bz2, xz and zip compressed data is detected
+          and decompressed while parsing.
+
+    Args:
+        data (BytesOrString): raw text from the package list,
+            binary data may also be given as `memoryview` or `mmap`
+        strict (bool): split packages on blank lines only,
+            faster but requires well formed input,
+            by default a new package starts once a field repeats
+        compact (bool): yield memory efficient `PackageRecord`
+            mappings instead of dictionaries
+        lazy (bool): yield `LazyRecord` mappings which keep raw values
+            and normalize them on the first access, usually slower
+            than eager parsing even when only a few fields are used
+        fields (Optional[Collection[str]]): fields to keep, by default all,
+            values of other fields are not built
+        where (Optional[Conditions]): field names mapped to accepted value,
+            collection of accepted values or a callable testing the value,
+            only packages satisfying every condition are returned
+
+    Returns:
+        (Iterator): each entry from packages as dictionary
+    """
+    if lazy:
+        if not isinstance(data, str) and detect_compression(bytes(data[:MAGIC_SIZE])):
+            return parse_lazy(decompressed(data), strict, fields, where)
+
+        return parse_lazy(data, strict, fields, where)
+
+    if isinstance(data, str):
+        return parse_records(data.splitlines(), strict, compact, fields, where)
+
+    if detect_compression(bytes(data[:MAGIC_SIZE])):
+        lines = chunk_lines(decompressed(data))
+        return parse_records(lines, strict, compact, fields, where)
+
+    return parse_buffer(data, strict, compact, fields=fields, where=where)
 
+
+def parse_stream(
+    source: StreamOrChunks,
+    chunk_size: int = CHUNK_SIZE,
+    strict: bool = False,
+    compact: bool = False,
+    fields: Optional[Collection[str]] = None,
+    where: Optional[Conditions] = None,
+) -> Iterator:
+    """Incrementally parse CRAN package metadata from a stream,
+    every package is yielded as soon as it is complete thus
+    only a single record is kept in memory at a time.
+
+    Args:
+        source (StreamOrChunks): binary or text file object or iterable
+            of chunks, compressed binary data is decompressed on the fly
+        chunk_size (int): amount of data to read from file objects at once
+        strict (bool): split packages on blank lines only, see `parse`
+        compact (bool): yield `PackageRecord` instead of dictionaries
+        fields (Optional[Collection[str]]): fields to keep, see `parse`
+        where (Optional[Conditions]): conditions to satisfy, see `parse`
+
+    Returns:
+        (Iterator): each entry from packages as dictionary
+    """
+    chunks = maybe_decompress(iter_chunks(source, chunk_size))
+    lines = stream_lines(chunks, chunk_size)
+    return parse_records(lines, strict, compact, fields, where)
+
+
+def load(
+    filename: str,
+    strict: bool = False,
+    compact: bool = False,
+    lazy: bool = False,
+    fields: Optional[Collection[str]] = None,
+    where: Optional[Conditions] = None,
+) -> Iterator:
+    """Parse package list file like `PACKAGES` or `PACKAGES.gz`
+    Note: file is memory mapped and decompressed in chunks,
+          gzip members with known size are decompressed in parallel.
     Args:
-        data (BytesOrString): raw text from the package list
+        filename (str): path to plain or compressed package list
+        strict (bool): split packages on blank lines only, see `parse`
+        compact (bool): yield `PackageRecord` instead of dictionaries
+        lazy (bool): yield `LazyRecord` mappings, see `parse`
+        fields (Optional[Collection[str]]): fields to keep, see `parse`
+        where (Optional[Conditions]): conditions to satisfy, see `parse`
 
     Returns:
-        (Generator): each entry from packages as dictionary
+        (Iterator): each entry from packages as dictionary
     """
-    fields: Set = set()
-    package: Dict = {}
-
-    def append(field_value: BytesOrString):
-        pairs = list(package.items())
-        if pairs:
-            last_field = pairs[-1][0]
-            package[last_field] += field_value
-
-    # We want to iterate over each line and accumulate
-    # keys in dictionary, once we meet the same key
-    # in our dictionary we have a single package
-    # metadata parsed so we yield and repeat again.
-    for line in data.splitlines():
-        line = as_string(line)
-
-        if not line.strip():
-            continue
-
-        if ":" in line:
-            parts = line.split(":", maxsplit=1)
-            field = parts[0].strip()
-            value = str("".join(parts[1:]).strip())
-
-            if not field[0].isalpha():
-                field = ""
-                value = line
-
-            if field and field in fields:
-                fields = {field}
-                result = {**package}
-                package = {field: value}
-                if result:
-                    yield result
+    with open(filename, "rb") as fp:
+        if not fp.read(1):
+            return
+
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if detect_compression(data[:MAGIC_SIZE]):
+                if observers:
+                    count(BYTES_READ, len(data))
+                chunks = decompressed(data)
+            else:
+                fp.seek(0)
+                chunks = iter_chunks(fp)
+
+            if lazy:
+                yield from parse_lazy(chunks, strict, fields, where)
             else:
-                # Here we want to parse dangling lines
-                # like the ones with long dependency
-                # list, `R (>= 2.15.0), xtable, pbapply ... \n    and more`
-                if field:
-                    package[field] = value.strip()
-                    fields.add(field)
-                else:
-                    append(f" {value.strip()}")
-        else:
-            append(f" {line.strip()}")
-
-    # We also need to return the metadata for
-    # the last parsed package.
-    if package:
-        yield package
+                lines = chunk_lines(chunks)
+                yield from parse_records(lines, strict, compact, fields, where)
+
+
+def decompressed(data: Any) -> Iterator[bytes]:
+    """Decompress data in chunks reporting time spent on it"""
+    chunks = decompress(data)
+    return timed(DECOMPRESS, chunks) if observers else chunks
 
 
 def encode(metadata: Dict) -> Optional[str]:
@@ -92,7 +179,7 @@ def encode(metadata: Dict) -> Optional[str]:
     return "\n".join([f"{key}: {value}" for key, value in metadata.items()])
 
 
-def decode(metadata: BytesOrString) -> Optional[Dict]:
+def decode(metadata: BytesOrString, compact: bool = False) -> Optional[Mapping]:
     """Parse package metadata
     Note: it is a shorthand to `parse`
           then extracts the first value from it.
@@ -110,23 +197,28 @@ def decode(metadata: BytesOrString) -> Optional[Dict]:
 
     Args:
         metadata (str): metadata text information
+        compact (bool): return `PackageRecord` instead of dictionary
 
     Returns:
-        (Optional[Dict]): Parse deb format and return dictionary
+        (Optional[Mapping]): Parse deb format and return dictionary
     """
     try:
-        [package, *_rest] = list(parse(metadata))
+        [package, *_rest] = list(parse(metadata, compact=compact))
         return package
     except (ValueError, TypeError):
+        if observers:
+            count(ERRORS)
         return None
 
 
-def from_file(archive: PathOrTarFile) -> Optional[Dict]:
+def from_file(archive: PathOrTarFile, compact: bool = False) -> Optional[Mapping]:
     """Load and parse CRAN package archive
     Args:
         archive (PathOrTarFile): path to archive or `tarfile.TarFile` instance
+        compact (bool): return `PackageRecord` instead of dictionary
 
     Returns:
         (dict): Dictionary of R package metadata
     """
-    return decode(read_description(archive))
+    with timer(FROM_FILE, errors=True):
+        return decode(read_description(archive), compact)
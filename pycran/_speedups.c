@@ -0,0 +1,386 @@
+/*
+ * Compiled versions of `pycran.parser.parse_lines` and
+ * `pycran.parser.parse_stanzas` having exactly the same semantics,
+ * the pure Python ones are used whenever this module is not built.
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+typedef struct {
+    PyObject_HEAD
+    PyObject *lines;   /* iterator of decoded lines */
+    PyObject *package; /* fields of the package being parsed */
+    PyObject *field;   /* name of the field being read or NULL */
+    PyObject *value;   /* stripped value of its field line */
+    PyObject *buffer;  /* list of value and continuation lines or NULL */
+    PyObject *wanted;  /* set of fields to keep or NULL to keep all */
+    PyObject *names;   /* fields seen in the package if some are not kept */
+    int skipping;      /* the field being read is not kept */
+    int strict;        /* split packages on blank lines only */
+    int done;
+} Parser;
+
+static PyObject *space;
+
+static void strip(int kind, const void *data, Py_ssize_t *start, Py_ssize_t *end)
+{
+    while (*start < *end && Py_UNICODE_ISSPACE(PyUnicode_READ(kind, data, *start)))
+        (*start)++;
+    while (*end > *start && Py_UNICODE_ISSPACE(PyUnicode_READ(kind, data, *end - 1)))
+        (*end)--;
+}
+
+/* Store the value of the field being read, same as `" ".join(buffer)` */
+static int finish_field(Parser *self)
+{
+    int result;
+
+    if (self->field == NULL)
+        return 0;
+
+    if (self->skipping) {
+        self->skipping = 0;
+        Py_CLEAR(self->field);
+        return 0;
+    }
+
+    if (self->buffer != NULL) {
+        PyObject *value = PyUnicode_Join(space, self->buffer);
+        if (value == NULL)
+            return -1;
+        result = PyDict_SetItem(self->package, self->field, value);
+        Py_DECREF(value);
+    } else {
+        result = PyDict_SetItem(self->package, self->field, self->value);
+    }
+
+    Py_CLEAR(self->buffer);
+    Py_CLEAR(self->value);
+    Py_CLEAR(self->field);
+    return result;
+}
+
+/* Hand over the package being parsed and start a new one */
+static PyObject *take_package(Parser *self)
+{
+    PyObject *package = self->package;
+
+    self->package = PyDict_New();
+    if (self->package == NULL) {
+        self->package = package;
+        return NULL;
+    }
+    return package;
+}
+
+static PyObject *Parser_next(Parser *self)
+{
+    PyObject *line;
+
+    if (self->done)
+        return NULL;
+
+    while ((line = PyIter_Next(self->lines)) != NULL) {
+        Py_ssize_t length, start, end, colon, name_start, name_end;
+        const void *data;
+        int kind;
+
+        if (!PyUnicode_Check(line)) {
+            PyErr_Format(PyExc_TypeError, "expected str line, got %.200s",
+                         Py_TYPE(line)->tp_name);
+            Py_DECREF(line);
+            return NULL;
+        }
+#if PY_VERSION_HEX < 0x030C0000
+        if (PyUnicode_READY(line) < 0) {
+            Py_DECREF(line);
+            return NULL;
+        }
+#endif
+
+        kind = PyUnicode_KIND(line);
+        data = PyUnicode_DATA(line);
+        length = PyUnicode_GET_LENGTH(line);
+        start = 0;
+        end = length;
+        strip(kind, data, &start, &end);
+
+        if (start == end) {
+            if (self->strict && self->field != NULL) {
+                if (finish_field(self) < 0) {
+                    Py_DECREF(line);
+                    return NULL;
+                }
+                Py_DECREF(line);
+                return take_package(self);
+            }
+            Py_DECREF(line);
+            continue;
+        }
+
+        colon = PyUnicode_FindChar(line, ':', 0, length, 1);
+        if (colon == -2) {
+            Py_DECREF(line);
+            return NULL;
+        }
+
+        /* indented lines always continue the field in DCF format */
+        if (colon >= 0 && self->strict && start > 0) {
+            Py_UCS4 first = PyUnicode_READ(kind, data, 0);
+            if (first == ' ' || first == '\t')
+                colon = -1;
+        }
+
+        if (colon >= 0) {
+            name_start = 0;
+            name_end = colon;
+            strip(kind, data, &name_start, &name_end);
+            if (name_start < name_end &&
+                Py_UNICODE_ISALPHA(PyUnicode_READ(kind, data, name_start))) {
+                PyObject *name, *value = NULL, *completed = NULL;
+                Py_ssize_t value_start = colon + 1, value_end = length;
+                int repeated, keep = 1;
+
+                name = PyUnicode_Substring(line, name_start, name_end);
+                if (name != NULL && self->wanted != NULL)
+                    keep = PySet_Contains(self->wanted, name);
+                /* values of fields which are not kept are never built */
+                if (name != NULL && keep > 0) {
+                    strip(kind, data, &value_start, &value_end);
+                    value = PyUnicode_Substring(line, value_start, value_end);
+                }
+                Py_DECREF(line);
+                if (name == NULL || keep < 0 || (keep && value == NULL) ||
+                    finish_field(self) < 0)
+                    goto error;
+
+                if (!self->strict) {
+                    if (self->names != NULL)
+                        repeated = PySet_Contains(self->names, name);
+                    else
+                        repeated = PyDict_Contains(self->package, name);
+                    if (repeated < 0)
+                        goto error;
+                    if (repeated) {
+                        completed = take_package(self);
+                        if (completed == NULL)
+                            goto error;
+                        if (self->names != NULL && PySet_Clear(self->names) < 0)
+                            goto error;
+                    }
+                    if (self->names != NULL && PySet_Add(self->names, name) < 0)
+                        goto error;
+                }
+
+                self->field = name;
+                self->value = value;
+                self->skipping = !keep;
+                if (completed != NULL)
+                    return completed;
+                continue;
+
+            error:
+                Py_XDECREF(name);
+                Py_XDECREF(value);
+                Py_XDECREF(completed);
+                return NULL;
+            }
+        }
+
+        /* continuation line of the field being read */
+        if (self->field != NULL) {
+            PyObject *stripped;
+
+            if (self->skipping) {
+                Py_DECREF(line);
+                continue;
+            }
+
+            stripped = PyUnicode_Substring(line, start, end);
+            Py_DECREF(line);
+            if (stripped == NULL)
+                return NULL;
+
+            if (self->buffer == NULL) {
+                self->buffer = PyList_New(1);
+                if (self->buffer == NULL) {
+                    Py_DECREF(stripped);
+                    return NULL;
+                }
+                Py_INCREF(self->value);
+                PyList_SET_ITEM(self->buffer, 0, self->value);
+            }
+
+            if (PyList_Append(self->buffer, stripped) < 0) {
+                Py_DECREF(stripped);
+                return NULL;
+            }
+            Py_DECREF(stripped);
+            continue;
+        }
+
+        Py_DECREF(line);
+    }
+
+    if (PyErr_Occurred())
+        return NULL;
+
+    /* the last package if any */
+    self->done = 1;
+    if (self->field == NULL)
+        return NULL;
+
+    if (finish_field(self) < 0)
+        return NULL;
+
+    return take_package(self);
+}
+
+static int Parser_traverse(Parser *self, visitproc visit, void *arg)
+{
+    Py_VISIT(self->lines);
+    Py_VISIT(self->package);
+    Py_VISIT(self->buffer);
+    Py_VISIT(self->wanted);
+    Py_VISIT(self->names);
+    return 0;
+}
+
+static int Parser_clear(Parser *self)
+{
+    Py_CLEAR(self->lines);
+    Py_CLEAR(self->package);
+    Py_CLEAR(self->field);
+    Py_CLEAR(self->value);
+    Py_CLEAR(self->buffer);
+    Py_CLEAR(self->wanted);
+    Py_CLEAR(self->names);
+    return 0;
+}
+
+static void Parser_dealloc(Parser *self)
+{
+    PyObject_GC_UnTrack(self);
+    Parser_clear(self);
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+static PyTypeObject ParserType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "pycran._speedups.Parser",                /* tp_name */
+    sizeof(Parser),                           /* tp_basicsize */
+    0,                                        /* tp_itemsize */
+    (destructor)Parser_dealloc,               /* tp_dealloc */
+    0,                                        /* tp_print */
+    0,                                        /* tp_getattr */
+    0,                                        /* tp_setattr */
+    0,                                        /* tp_as_async */
+    0,                                        /* tp_repr */
+    0,                                        /* tp_as_number */
+    0,                                        /* tp_as_sequence */
+    0,                                        /* tp_as_mapping */
+    0,                                        /* tp_hash */
+    0,                                        /* tp_call */
+    0,                                        /* tp_str */
+    0,                                        /* tp_getattro */
+    0,                                        /* tp_setattro */
+    0,                                        /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC,  /* tp_flags */
+    "Iterator of parsed packages",            /* tp_doc */
+    (traverseproc)Parser_traverse,            /* tp_traverse */
+    (inquiry)Parser_clear,                    /* tp_clear */
+    0,                                        /* tp_richcompare */
+    0,                                        /* tp_weaklistoffset */
+    PyObject_SelfIter,                        /* tp_iter */
+    (iternextfunc)Parser_next,                /* tp_iternext */
+};
+
+static PyObject *new_parser(PyObject *args, int strict)
+{
+    Parser *self;
+    PyObject *lines, *fields = Py_None, *iterator;
+
+    if (!PyArg_ParseTuple(args, "O|O", &lines, &fields))
+        return NULL;
+
+    iterator = PyObject_GetIter(lines);
+    if (iterator == NULL)
+        return NULL;
+
+    self = PyObject_GC_New(Parser, &ParserType);
+    if (self == NULL) {
+        Py_DECREF(iterator);
+        return NULL;
+    }
+
+    self->lines = iterator;
+    self->package = PyDict_New();
+    self->field = NULL;
+    self->value = NULL;
+    self->buffer = NULL;
+    self->wanted = NULL;
+    self->names = NULL;
+    self->skipping = 0;
+    self->strict = strict;
+    self->done = 0;
+    if (self->package == NULL) {
+        Py_DECREF(self);
+        return NULL;
+    }
+
+    if (fields != Py_None) {
+        self->wanted = PyFrozenSet_New(fields);
+        /* packages end once a field repeats, kept or not */
+        if (self->wanted != NULL && !strict)
+            self->names = PySet_New(NULL);
+        if (self->wanted == NULL || (!strict && self->names == NULL)) {
+            Py_DECREF(self);
+            return NULL;
+        }
+    }
+
+    PyObject_GC_Track(self);
+    return (PyObject *)self;
+}
+
+static PyObject *parse_lines(PyObject *module, PyObject *args)
+{
+    return new_parser(args, 0);
+}
+
+static PyObject *parse_stanzas(PyObject *module, PyObject *args)
+{
+    return new_parser(args, 1);
+}
+
+static PyMethodDef methods[] = {
+    {"parse_lines", parse_lines, METH_VARARGS,
+     "parse_lines(lines, fields=None)\n\n"
+     "Parse metadata lines, a new package starts once one of its fields repeats,\n"
+     "only the given fields are kept if any"},
+    {"parse_stanzas", parse_stanzas, METH_VARARGS,
+     "parse_stanzas(lines, fields=None)\n\n"
+     "Parse blank line separated metadata lines,\n"
+     "only the given fields are kept if any"},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef module = {
+    PyModuleDef_HEAD_INIT,
+    "pycran._speedups",
+    "Compiled metadata line parsers",
+    -1,
+    methods
+};
+
+PyMODINIT_FUNC PyInit__speedups(void)
+{
+    space = PyUnicode_InternFromString(" ");
+    if (space == NULL)
+        return NULL;
+
+    if (PyType_Ready(&ParserType) < 0)
+        return NULL;
+
+    return PyModule_Create(&module);
+}
@@ -0,0 +1,308 @@
+import asyncio
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Union,
+)
+from urllib.parse import urljoin, urlsplit
+
+from pycran.compression import (
+    MAGIC_SIZE,
+    ZIP,
+    StreamDecompressor,
+    decompress_chunks,
+    detect_compression,
+)
+from pycran.errors import FetchError
+from pycran.parser import LineParser, StanzaParser
+from pycran.records import PackageRecord
+from pycran.typings import BytesOrString
+from pycran.util import CHUNK_SIZE, LineSplitter
+
+# Async generator function returning chunks of the response body for URL
+Transport = Callable[[str], AsyncIterable[bytes]]
+
+MAX_REDIRECTS = 5
+REDIRECTS = {301, 302, 303, 307, 308}
+
+# Seconds to wait for a connection or for the next piece of a response
+TIMEOUT = 30.0
+
+
+async def iter_chunks_async(
+    source: Any, chunk_size: int = CHUNK_SIZE
+) -> AsyncGenerator[BytesOrString, None]:
+    """Read chunks from async stream like `asyncio.StreamReader`
+    or from async iterable of chunks
+    Args:
+        source (Any): object with async `read` method or async iterable
+        chunk_size (int): amount of data to read from streams at once
+
+    Returns:
+        (AsyncGenerator): chunks of `bytes` or `str`
+    """
+    if hasattr(source, "read"):
+        while True:
+            chunk = await source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        async for chunk in source:
+            yield chunk
+
+
+async def maybe_decompress_async(
+    chunks: AsyncIterable[BytesOrString],
+) -> AsyncGenerator[BytesOrString, None]:
+    """Detect compressed binary stream and decompress it as it arrives,
+    other chunks are returned as they are, see `maybe_decompress`.
+
+    Args:
+        chunks (AsyncIterable[BytesOrString]): chunks of data
+
+    Returns:
+        (AsyncGenerator): decompressed chunks
+    """
+    iterator = chunks.__aiter__()
+    head: List[BytesOrString] = []
+    size = 0
+    async for chunk in iterator:
+        head.append(chunk)
+        size += len(chunk)
+        if size >= MAGIC_SIZE or not isinstance(chunk, bytes):
+            break
+
+    compression = None
+    if head and isinstance(head[0], bytes):
+        compression = detect_compression(b"".join(head)[:MAGIC_SIZE])  # type: ignore
+
+    async def rest() -> AsyncGenerator[BytesOrString, None]:
+        for chunk in head:
+            yield chunk
+        async for chunk in iterator:
+            yield chunk
+
+    if compression is None:
+        async for chunk in rest():
+            yield chunk
+        return
+
+    if compression == ZIP:
+        # zip archives keep their directory at the end
+        archive = [chunk async for chunk in rest()]
+        for data in decompress_chunks(archive, ZIP):  # type: ignore
+            yield data
+        return
+
+    stream = StreamDecompressor(compression)
+    async for chunk in rest():
+        for data in stream.feed(chunk):  # type: ignore
+            yield data
+
+    stream.close()
+
+
+async def parse_async(
+    source: Any,
+    chunk_size: int = CHUNK_SIZE,
+    strict: bool = False,
+    compact: bool = False,
+) -> AsyncGenerator[Any, None]:
+    """Parse CRAN package metadata while it arrives,
+    packages are yielded as soon as they are complete.
+
+    Args:
+        source (Any): async stream with `read` method or async iterable of chunks,
+            compressed binary data is decompressed on the fly
+        chunk_size (int): amount of data to read from streams at once
+        strict (bool): split packages on blank lines only, see `pycran.parse`
+        compact (bool): yield `PackageRecord` instead of dictionaries
+
+    Returns:
+        (AsyncGenerator): each entry from packages as dictionary
+    """
+    splitter = LineSplitter()
+    parser = StanzaParser() if strict else LineParser()
+    chunks = maybe_decompress_async(iter_chunks_async(source, chunk_size))
+    async for chunk in chunks:
+        for package in parser.feed(splitter.feed(chunk)):
+            yield PackageRecord(package) if compact else package
+
+    for package in parser.feed(splitter.close()):
+        yield PackageRecord(package) if compact else package
+
+    for package in parser.close():
+        yield PackageRecord(package) if compact else package
+
+
+async def read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return headers
+
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+
+async def read_body(
+    reader: asyncio.StreamReader, headers: Dict[str, str], chunk_size: int
+) -> AsyncGenerator[bytes, None]:
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                return
+
+            while size:
+                chunk = await reader.readexactly(min(size, chunk_size))
+                size -= len(chunk)
+                yield chunk
+
+            await reader.readline()
+
+    if "content-length" in headers:
+        remaining = int(headers["content-length"])
+        while remaining > 0:
+            chunk = await reader.read(min(chunk_size, remaining))
+            if not chunk:
+                raise FetchError("Connection closed before response was complete.")
+
+            remaining -= len(chunk)
+            yield chunk
+        return
+
+    while True:
+        chunk = await reader.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def within(awaitable: Any, timeout: Optional[float], url: str) -> Any:
+    """Wait for awaitable and report timeout as `FetchError`"""
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise FetchError(f"Timed out fetching {url}.") from None
+
+
+async def read_status(reader: asyncio.StreamReader, url: str) -> int:
+    status_line = (await reader.readline()).decode("latin-1")
+    try:
+        return int(status_line.split()[1])
+    except (IndexError, ValueError):
+        raise FetchError(f"Invalid response from {url}.") from None
+
+
+async def http_transport(
+    url: str, chunk_size: int = CHUNK_SIZE, timeout: Optional[float] = TIMEOUT
+) -> AsyncGenerator[bytes, None]:
+    """Minimal HTTP/1.1 client based on asyncio streams
+    which follows redirects and streams the response body.
+
+    Args:
+        url (str): `http` or `https` URL
+        chunk_size (int): amount of data to read at once
+        timeout (Optional[float]): seconds to wait for connecting and for
+            every read before `FetchError` is raised, `None` waits forever
+
+    Returns:
+        (AsyncGenerator): chunks of the response body
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        secure = parts.scheme == "https"
+        connection = asyncio.open_connection(
+            parts.hostname, parts.port or (443 if secure else 80), ssl=secure or None
+        )
+        reader, writer = await within(connection, timeout, url)
+        try:
+            target = parts.path or "/"
+            if parts.query:
+                target += f"?{parts.query}"
+
+            writer.write(
+                (
+                    f"GET {target} HTTP/1.1\r\n"
+                    f"Host: {parts.netloc}\r\n"
+                    "Accept-Encoding: identity\r\n"
+                    "Connection: close\r\n\r\n"
+                ).encode("latin-1")
+            )
+            await within(writer.drain(), timeout, url)
+
+            status = await within(read_status(reader, url), timeout, url)
+            headers = await within(read_headers(reader), timeout, url)
+            if status in REDIRECTS and "location" in headers:
+                url = urljoin(url, headers["location"])
+                continue
+
+            if status != 200:
+                raise FetchError(f"Failed to fetch {url}, status {status}.")
+
+            body = read_body(reader, headers, chunk_size)
+            while True:
+                try:
+                    chunk = await within(body.__anext__(), timeout, url)
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            writer.close()
+
+    raise FetchError(f"Too many redirects fetching {url}.")
+
+
+async def fetch(
+    url: str, transport: Transport = http_transport, **options: Any
+) -> AsyncGenerator[Any, None]:
+    """Fetch and parse remote package list like
+    https://cran.r-project.org/src/contrib/PACKAGES
+
+    Args:
+        url (str): URL of the package list
+        transport (Transport): async generator function streaming the URL,
+            by default a minimal HTTP client on top of asyncio streams
+        options (Any): `strict` and `compact` options of `parse_async`
+
+    Returns:
+        (AsyncGenerator): each entry from packages as dictionary
+    """
+    async for package in parse_async(transport(url), **options):
+        yield package
+
+
+async def fetch_many(
+    urls: Iterable[str],
+    transport: Transport = http_transport,
+    limit: int = 8,
+    **options: Any,
+) -> Dict[str, Union[List, BaseException]]:
+    """Fetch and parse many package lists concurrently
+    Args:
+        urls (Iterable[str]): URLs of package lists
+        transport (Transport): async generator function streaming the URL
+        limit (int): maximum number of concurrent downloads
+        options (Any): `strict` and `compact` options of `parse_async`
+
+    Returns:
+        (Dict[str, Union[List, BaseException]]): packages or error by URL
+    """
+    urls = list(urls)
+    semaphore = asyncio.Semaphore(limit)
+
+    async def collect(url: str) -> List:
+        async with semaphore:
+            return [package async for package in fetch(url, transport, **options)]
+
+    results = await asyncio.gather(*map(collect, urls), return_exceptions=True)
+    return dict(zip(urls, results))
@@ -0,0 +1,196 @@
+import fnmatch
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice, repeat
+from typing import Any, Deque, Generator, Iterable, Iterator, List, Optional, Tuple
+
+from pycran import from_file, parse
+from pycran.compression import MAGIC_SIZE, detect_compression
+from pycran.metrics import ERRORS, count, observers
+from pycran.parser import line_parser
+from pycran.records import PackageRecord
+from pycran.typings import BytesOrString
+from pycran.util import decode_text, split_lines
+
+# Path of the archive and its metadata or the exception raised reading it
+Result = Tuple[str, Any]
+
+CHUNK_SIZE = 16
+
+# Number of blobs decoded by a worker at once
+BLOB_CHUNK_SIZE = 1024
+
+
+def extract(paths: List[str], compact: bool = False) -> List[Result]:
+    """Load metadata of every archive capturing errors per file
+    Args:
+        paths (List[str]): paths to R source archives
+        compact (bool): return `PackageRecord` instead of dictionaries
+
+    Returns:
+        (List[Result]): path and metadata or exception for every archive
+    """
+    results: List[Result] = []
+    for path in paths:
+        try:
+            results.append((path, from_file(path, compact)))
+        except Exception as e:
+            results.append((path, e))
+
+    return results
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    return iter(lambda: list(islice(iterator, size)), [])
+
+
+def from_files(
+    paths: Iterable[str],
+    workers: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    ordered: bool = False,
+    compact: bool = False,
+) -> Generator[Result, None, None]:
+    """Load metadata from many R source archives using a process pool
+    Note: archives are submitted in chunks and only a couple of chunks
+          per worker are in flight so `paths` may be a lazy iterable.
+    Args:
+        paths (Iterable[str]): paths to R source archives
+        workers (Optional[int]): number of processes, defaults to CPU count,
+            `1` loads archives in the current process
+        chunk_size (int): number of archives per submitted task
+        ordered (bool): yield results in the order of `paths`,
+            otherwise results are yielded as soon as chunks finish
+        compact (bool): return `PackageRecord` instead of dictionaries
+
+    Returns:
+        (Generator): path and metadata or exception raised reading the archive,
+            for example `NotTarFile` or `DescriptionNotFound`
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = chunked(paths, chunk_size)
+    if workers == 1:
+        for chunk in chunks:
+            yield from extract(chunk, compact)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: Deque[Future] = deque()
+
+        def submit(count: int):
+            for chunk in islice(chunks, count):
+                pending.append(executor.submit(extract, chunk, compact))
+
+        submit(workers * 2)
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = done.pop()
+                pending.remove(future)
+
+            yield from future.result()
+            submit(1)
+
+
+def find_archives(
+    root: str, pattern: str = "*.tar.gz", recursive: bool = True
+) -> Generator[str, None, None]:
+    """Find R source archives in the directory
+    Args:
+        root (str): directory to look into
+        pattern (str): file name pattern of archives
+        recursive (bool): also look into subdirectories like `Archive/<pkg>`
+
+    Returns:
+        (Generator): paths to archives
+    """
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(fnmatch.filter(files, pattern)):
+            yield os.path.join(directory, name)
+
+        if not recursive:
+            return
+
+
+def scan_directory(
+    root: str, pattern: str = "*.tar.gz", recursive: bool = True, **options: Any
+) -> Generator[Result, None, None]:
+    """Load metadata from all R source archives in the directory,
+    for example local mirror of `src/contrib`.
+
+    Args:
+        root (str): directory to look into
+        pattern (str): file name pattern of archives
+        recursive (bool): also look into subdirectories
+        options (Any): options passed to `from_files`
+
+    Returns:
+        (Generator): path and metadata or exception raised reading the archive
+    """
+    return from_files(find_archives(root, pattern, recursive), **options)
+
+
+def blob_lines(blob: BytesOrString) -> List[str]:
+    """Split metadata into lines in the same way as `pycran.parse` does"""
+    if isinstance(blob, str):
+        return blob.splitlines()
+
+    return split_lines(decode_text(blob))
+
+
+def decode_blobs(blobs: List[Any], compact: bool = False) -> List[Any]:
+    """Decode the first package of every blob capturing errors per blob"""
+    results: List[Any] = []
+    for blob in blobs:
+        try:
+            if not isinstance(blob, str) and detect_compression(blob[:MAGIC_SIZE]):
+                results.append(next(parse(blob, compact=compact), None))
+                continue
+
+            package = next(line_parser(blob_lines(blob)), None)
+            if package is not None and compact:
+                package = PackageRecord(package)
+            results.append(package)
+        except Exception as e:
+            if observers:
+                count(ERRORS)
+            results.append(e)
+
+    return results
+
+
+def decode_many(
+    blobs: Iterable[BytesOrString],
+    workers: int = 1,
+    chunk_size: int = BLOB_CHUNK_SIZE,
+    compact: bool = False,
+) -> List[Any]:
+    """Decode many package descriptions like `pycran.decode` does,
+    parsing of every blob stops once its first package is complete.
+
+    Args:
+        blobs (Iterable[BytesOrString]): contents of `DESCRIPTION` files
+        workers (int): number of processes, `1` decodes in the current process
+        chunk_size (int): number of blobs per task sent to a process
+        compact (bool): return `PackageRecord` instead of dictionaries
+
+    Returns:
+        (List[Any]): metadata in the order of `blobs`, `None` for blobs
+            without any fields or exception raised decoding the blob
+            like `UnicodeDecodeError`
+    """
+    if workers == 1:
+        return decode_blobs(list(blobs), compact)
+
+    results: List[Any] = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = chunked(blobs, chunk_size)
+        for chunk in executor.map(decode_blobs, chunks, repeat(compact)):
+            results.extend(chunk)
+
+    return results
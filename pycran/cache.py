@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Mapping, Optional
+
+from pycran import from_file
+from pycran.records import PackageRecord
+
+MAX_ENTRIES = 100_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    value TEXT NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed);
+CREATE INDEX IF NOT EXISTS metadata_path ON metadata (path);
+"""
+
+
+def file_md5(path: str) -> str:
+    """Compute MD5 checksum of the file as listed in `MD5sum` field"""
+    digest = hashlib.md5()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class MetadataCache:
+    """Persistent cache of `pycran.from_file` results in a SQLite file
+
+    Archives are identified by path, size and modification time or,
+    when known, by MD5 checksum so moved archives are still found.
+    Least recently used entries are evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, path: str, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.size = self.count()
+
+    def count(self) -> int:
+        """Number of cached entries"""
+        return self.connection.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+
+    @staticmethod
+    def key(path: str, md5: Optional[str] = None) -> str:
+        """Cache key of the archive
+        Args:
+            path (str): path to archive
+            md5 (Optional[str]): MD5 checksum of the archive if known
+
+        Returns:
+            (str): key built from checksum or from file identity
+        """
+        if md5:
+            return f"md5:{md5.lower()}"
+
+        stat = os.stat(path)
+        return f"stat:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.connection.execute(
+            "SELECT value FROM metadata WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        self.connection.execute(
+            "UPDATE metadata SET accessed = ? WHERE key = ?", (time.time(), key)
+        )
+        return row[0]
+
+    def put(self, key: str, path: str, value: str):
+        # entries are only put after a cache miss so this is a new key
+        self.connection.execute(
+            "INSERT OR REPLACE INTO metadata (key, path, value, accessed) "
+            "VALUES (?, ?, ?, ?)",
+            (key, os.path.abspath(path), value, time.time()),
+        )
+        self.size += 1
+        if self.size > self.max_entries:
+            self.evict(self.size - self.max_entries)
+
+    def evict(self, count: int):
+        """Remove least recently used entries"""
+        self.connection.execute(
+            "DELETE FROM metadata WHERE key IN "
+            "(SELECT key FROM metadata ORDER BY accessed LIMIT ?)",
+            (count,),
+        )
+        self.size = self.count()
+
+    def from_file(
+        self,
+        path: str,
+        md5: Optional[str] = None,
+        by_content: bool = False,
+        compact: bool = False,
+    ) -> Optional[Mapping]:
+        """Load and parse CRAN package archive reusing cached results
+        Args:
+            path (str): path to archive
+            md5 (Optional[str]): MD5 checksum of the archive,
+                for example `MD5sum` field from PACKAGES file
+            by_content (bool): compute MD5 checksum of the archive
+                instead of relying on its size and modification time
+            compact (bool): return `PackageRecord` instead of dictionary
+
+        Returns:
+            (Optional[Mapping]): Dictionary of R package metadata
+        """
+        if by_content and not md5:
+            md5 = file_md5(path)
+
+        key = self.key(path, md5)
+        value = self.get(key)
+        if value is None:
+            metadata = from_file(path)
+            self.put(key, path, json.dumps(metadata))
+        else:
+            metadata = json.loads(value)
+
+        if compact and metadata is not None:
+            return PackageRecord(metadata)
+
+        return metadata
+
+    def invalidate(self, path: Optional[str] = None, md5: Optional[str] = None):
+        """Remove cached entries of the archive by its path or checksum"""
+        if path:
+            self.connection.execute(
+                "DELETE FROM metadata WHERE path = ?", (os.path.abspath(path),)
+            )
+
+        if md5:
+            self.connection.execute(
+                "DELETE FROM metadata WHERE key = ?", (self.key(path or "", md5),)
+            )
+
+        self.size = self.count()
+
+    def clear(self):
+        """Remove all cached entries"""
+        self.connection.execute("DELETE FROM metadata")
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self) -> "MetadataCache":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
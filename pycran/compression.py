@@ -0,0 +1,305 @@
+import bz2
+import lzma
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from itertools import chain
+from typing import Any, Deque, Iterable, Iterator, List, Optional, Tuple
+from zipfile import ZipFile
+
+from pycran.typings import BytesOrString
+from pycran.util import CHUNK_SIZE
+
+GZIP = "gzip"
+BZIP2 = "bz2"
+XZ = "xz"
+ZIP = "zip"
+
+# Enough bytes to recognize every supported format
+MAGIC_SIZE = 10
+
+# Largest input of a single gzip member so that compressed member fits
+# into 64 KiB as required by BGZF which stores member size in its header
+BLOCK_SIZE = 65280
+
+# gzip header with `BC` extra subfield holding compressed member size minus one
+BLOCK_HEADER = struct.Struct("<4BI2BH2BHH")
+
+
+def detect_compression(header: bytes) -> Optional[str]:
+    """Detect compression format by magic bytes
+    Args:
+        header (bytes): first bytes of data
+
+    Returns:
+        (Optional[str]): one of `gzip`, `bz2`, `xz`, `zip` or `None`
+    """
+    if header.startswith(b"\x1f\x8b"):
+        return GZIP
+
+    if header.startswith(b"\xfd7zXZ\x00"):
+        return XZ
+
+    if header.startswith(b"PK\x03\x04"):
+        return ZIP
+
+    # `BZh` followed by block size digit and block magic,
+    # or end-of-stream magic right away if the stream is empty
+    if (
+        header[:3] == b"BZh"
+        and header[3:4].isdigit()
+        and header[4:10] in (b"1AY&SY", b"\x17rE8P\x90")
+    ):
+        return BZIP2
+
+    return None
+
+
+def decompressor(compression: str) -> Any:
+    if compression == GZIP:
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    if compression == BZIP2:
+        return bz2.BZ2Decompressor()
+
+    return lzma.LZMADecompressor()
+
+
+def decompress_chunks(chunks: Iterable[bytes], compression: str) -> Iterator[bytes]:
+    """Decompress stream of chunks as they come,
+    concatenated streams like multi-member gzip files are supported
+    and `EOFError` is raised if the data ends in the middle of a stream.
+
+    Args:
+        chunks (Iterable[bytes]): compressed data
+        compression (str): one of `gzip`, `bz2`, `xz` or `zip`
+
+    Returns:
+        (Iterator[bytes]): decompressed chunks
+    """
+    if compression == ZIP:
+        # zip archives keep their directory at the end
+        # so the whole archive has to be read first
+        yield from unzip(BytesIO(b"".join(chunks)))
+        return
+
+    stream = StreamDecompressor(compression)
+    for chunk in chunks:
+        yield from stream.feed(chunk)
+
+    stream.close()
+
+
+class StreamDecompressor:
+    """Incremental decompressor of concatenated gzip, bz2 or xz streams,
+    state is kept between `feed` calls so chunks may come as they arrive.
+
+    Args:
+        compression (str): one of `gzip`, `bz2` or `xz`
+    """
+
+    def __init__(self, compression: str):
+        self.compression = compression
+        self.state = decompressor(compression)
+        self.started = False
+
+    def feed(self, chunk: bytes) -> Iterator[bytes]:
+        """Decompress next chunk
+        Args:
+            chunk (bytes): compressed data
+
+        Returns:
+            (Iterator[bytes]): decompressed data
+        """
+        while chunk:
+            self.started = True
+            data = self.state.decompress(chunk)
+            if data:
+                yield data
+
+            if not self.state.eof:
+                break
+
+            chunk = self.state.unused_data
+            self.state = decompressor(self.compression)
+            self.started = False
+
+    def close(self) -> None:
+        """Check that the last stream is complete"""
+        if self.started:
+            # the last stream is truncated, its data is incomplete
+            raise EOFError(
+                "Compressed file ended before the end-of-stream marker was reached"
+            )
+
+
+def unzip(source: Any, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """Read the first member of zip archive in chunks"""
+    with ZipFile(source) as archive:
+        with archive.open(archive.infolist()[0]) as fp:
+            yield from iter(lambda: fp.read(chunk_size), b"")
+
+
+def block_size(data: Any, offset: int) -> Optional[int]:
+    """Size of gzip member starting at offset if it is known from its header"""
+    header = bytes(data[offset : offset + BLOCK_HEADER.size])
+    if len(header) < BLOCK_HEADER.size:
+        return None
+
+    id1, id2, method, flags, _, _, _, extra, si1, si2, _, size = BLOCK_HEADER.unpack(
+        header
+    )
+    if (id1, id2, method, flags & 4, extra, si1, si2) != (31, 139, 8, 4, 6, 66, 67):
+        return None
+
+    return size + 1
+
+
+def block_spans(data: Any) -> Tuple[List[Tuple[int, int]], int]:
+    """Find gzip members having their size in the header
+    Args:
+        data (Any): bytes like object with gzip data
+
+    Returns:
+        (Tuple[List[Tuple[int, int]], int]): start and end of members and
+            offset of the remaining data which has to be read sequentially
+    """
+    spans = []
+    offset = 0
+    while offset < len(data):
+        size = block_size(data, offset)
+        # truncated member is left for sequential decompression to report
+        if size is None or offset + size > len(data):
+            break
+
+        spans.append((offset, offset + size))
+        offset += size
+
+    return spans, offset
+
+
+def inflate(data: Any, spans: List[Tuple[int, int]]) -> bytes:
+    return b"".join(zlib.decompress(data[start:end], 31) for start, end in spans)
+
+
+def decompress(
+    data: Any, workers: Optional[int] = None, batch_size: int = 16
+) -> Iterator[bytes]:
+    """Decompress in-memory or memory mapped data in chunks,
+    gzip members which have their size in the header like BGZF
+    ones written by `compress_blocks` are decompressed in parallel.
+
+    Args:
+        data (Any): compressed bytes like object
+        workers (Optional[int]): number of threads, defaults to CPU count
+        batch_size (int): number of gzip members per task
+
+    Returns:
+        (Iterator[bytes]): decompressed chunks in order
+    """
+    compression = detect_compression(bytes(data[:MAGIC_SIZE]))
+    if compression is None:
+        raise ValueError("Unknown compression format.")
+
+    if compression == ZIP:
+        yield from unzip(BytesIO(data))
+        return
+
+    spans: List[Tuple[int, int]] = []
+    offset = 0
+    if compression == GZIP:
+        spans, offset = block_spans(data)
+
+    workers = workers or os.cpu_count() or 1
+    if len(spans) > batch_size and workers > 1:
+        batches = (spans[i : i + batch_size] for i in range(0, len(spans), batch_size))
+        # zlib releases the GIL so threads decompress members in parallel,
+        # only a few batches are in flight to keep memory bounded
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending: Deque[Future] = deque()
+            for batch in chain(batches, [None]):
+                if batch is not None:
+                    pending.append(executor.submit(inflate, data, batch))
+                    if len(pending) < workers * 2:
+                        continue
+
+                while pending and (batch is None or len(pending) >= workers * 2):
+                    yield pending.popleft().result()
+    elif spans:
+        for start, end in spans:
+            yield zlib.decompress(data[start:end], 31)
+
+    # feed the rest in slices so decompressed output stays small
+    slices = (data[i : i + CHUNK_SIZE] for i in range(offset, len(data), CHUNK_SIZE))
+    yield from decompress_chunks(slices, compression)
+
+
+def maybe_decompress(chunks: Iterable[BytesOrString]) -> Iterator[BytesOrString]:
+    """Detect compressed binary stream and decompress it,
+    other chunks are returned as they are.
+
+    Args:
+        chunks (Iterable[BytesOrString]): chunks of data
+
+    Returns:
+        (Iterator[BytesOrString]): decompressed chunks
+    """
+    iterator = iter(chunks)
+    head: List[BytesOrString] = []
+    size = 0
+    for chunk in iterator:
+        head.append(chunk)
+        size += len(chunk)
+        if size >= MAGIC_SIZE or not isinstance(chunk, bytes):
+            break
+
+    if not head or not isinstance(head[0], bytes):
+        return chain(head, iterator)
+
+    compression = detect_compression(b"".join(head)[:MAGIC_SIZE])  # type: ignore
+    if compression is None:
+        return chain(head, iterator)
+
+    return decompress_chunks(chain(head, iterator), compression)  # type: ignore
+
+
+def compress_blocks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress data as gzip members of at most 64 KiB having
+    their size in the header as defined by BGZF format,
+    result is a valid gzip stream which can also be decompressed
+    in parallel by `decompress`.
+
+    Args:
+        chunks (Iterable[bytes]): data to compress
+        level (int): compression level
+
+    Returns:
+        (Iterator[bytes]): compressed gzip members
+    """
+    tail = b""
+    for chunk in chunks:
+        view = memoryview(tail + chunk if tail else chunk)
+        end = len(view) - len(view) % BLOCK_SIZE
+        for offset in range(0, end, BLOCK_SIZE):
+            yield compress_block(view[offset : offset + BLOCK_SIZE], level)
+
+        # only the incomplete block is carried over to the next chunk
+        tail = bytes(view[end:])
+
+    if tail:
+        yield compress_block(tail, level)
+
+
+def compress_block(block: Any, level: int) -> bytes:
+    """Compress data as a single gzip member having its size in the header"""
+    state = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = state.compress(block) + state.flush()
+    size = BLOCK_HEADER.size + len(body) + 8
+    return (
+        BLOCK_HEADER.pack(31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, size - 1)
+        + body
+        + struct.pack("<II", zlib.crc32(block), len(block))
+    )
@@ -0,0 +1,230 @@
+import operator
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+CACHE_SIZE = 65536
+
+DEPENDENCY_FIELDS = ("Depends", "Imports", "LinkingTo", "Suggests")
+
+# Packages shipped with R itself which never appear in package lists
+BASE_PACKAGES = frozenset(
+    [
+        "R",
+        "base",
+        "compiler",
+        "datasets",
+        "graphics",
+        "grDevices",
+        "grid",
+        "methods",
+        "parallel",
+        "splines",
+        "stats",
+        "stats4",
+        "tcltk",
+        "tools",
+        "utils",
+    ]
+)
+
+OPERATORS: Dict[str, Callable] = {
+    ">=": operator.ge,
+    ">": operator.gt,
+    "<=": operator.le,
+    "<": operator.lt,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+DEPENDENCY = re.compile(
+    r"^(?P<name>[^\s(]+)\s*(?:\(\s*(?P<operator>[<>=!]=?)\s*(?P<version>[^)]*?)\s*\))?$"
+)
+VERSION_SEPARATOR = re.compile(r"[.-]")
+WHITESPACE = re.compile(r"\s+")
+
+Version = Tuple[int, ...]
+
+
+class Dependency(NamedTuple):
+    name: str
+    operator: Optional[str] = None
+    version: Optional[str] = None
+
+
+class Unsatisfied(NamedTuple):
+    package: str
+    field: str
+    dependency: Dependency
+    # version of the dependency in the index or `None` if it is missing
+    available: Optional[str]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_dependencies(value: str) -> Tuple[Dependency, ...]:
+    """Parse dependency field like `Depends` or `Imports`
+    Note: results are cached since the same values
+          are repeated across many packages.
+    Args:
+        value (str): field value like `R (>= 2.15.0), xtable, pbapply,`
+
+    Returns:
+        (Tuple[Dependency, ...]): name, operator and version of dependencies
+    """
+    dependencies = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+
+        match = DEPENDENCY.match(item)
+        if match is None:
+            raise ValueError(f"Invalid dependency {item!r}.")
+
+        name, comparison, version = match.group("name", "operator", "version")
+        if comparison is not None:
+            if comparison not in OPERATORS:
+                raise ValueError(f"Invalid version operator in {item!r}.")
+            version = WHITESPACE.sub("", version)
+
+        dependencies.append(Dependency(name, comparison, version))
+
+    return tuple(dependencies)
+
+
+def parse_valid_dependencies(value: str) -> Tuple[Tuple[Dependency, ...], List[str]]:
+    """Parse dependency field skipping malformed items
+    like `R (>= 3.0.0) methods` found in some archived packages.
+
+    Args:
+        value (str): field value
+
+    Returns:
+        (Tuple[Tuple[Dependency, ...], List[str]]): parsed dependencies
+            and text of malformed items
+    """
+    try:
+        return parse_dependencies(value), []
+    except ValueError:
+        pass
+
+    dependencies: List[Dependency] = []
+    invalid = []
+    for item in value.split(","):
+        try:
+            dependencies.extend(parse_dependencies(item))
+        except ValueError:
+            invalid.append(item.strip())
+
+    return tuple(dependencies), invalid
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_version(version: str) -> Version:
+    """Parse version like R `package_version` does
+    Args:
+        version (str): version like `1.0-2` or `3.6.0`
+
+    Returns:
+        (Version): numeric components of version
+    """
+    try:
+        return tuple(int(part) for part in VERSION_SEPARATOR.split(version.strip()))
+    except ValueError:
+        raise ValueError(f"Invalid version {version!r}.") from None
+
+
+def compare_versions(left: str, right: str) -> int:
+    """Compare versions in the same way as R does
+    Args:
+        left (str): version
+        right (str): version
+
+    Returns:
+        (int): negative if left is older, zero if equal, positive if newer
+    """
+    first, second = parse_version(left), parse_version(right)
+    return (first > second) - (first < second)
+
+
+def satisfies(version: str, dependency: Dependency) -> bool:
+    """Check if version satisfies dependency constraint
+    Args:
+        version (str): available version
+        dependency (Dependency): dependency with optional version constraint
+
+    Returns:
+        (bool): `True` if version matches constraint
+    """
+    if dependency.operator is None:
+        return True
+
+    compare = OPERATORS[dependency.operator]
+    return compare(parse_version(version), parse_version(dependency.version or ""))
+
+
+def check_dependencies(
+    packages: Iterable[Mapping],
+    available: Optional[Mapping[str, str]] = None,
+    fields: Iterable[str] = ("Depends", "Imports", "LinkingTo"),
+) -> List[Unsatisfied]:
+    """Check dependency constraints of all packages at once
+    Note: every distinct constraint is evaluated once against
+          every distinct version no matter how many packages share it.
+    Args:
+        packages (Iterable[Mapping]): parsed packages,
+            records without `Package` field are not checked
+        available (Optional[Mapping[str, str]]): additional versions,
+            for example `{"R": "4.0.0"}`, by default base packages are
+            assumed to be available and are not checked
+        fields (Iterable[str]): dependency fields to check
+
+    Returns:
+        (List[Unsatisfied]): dependencies which are missing or
+            do not match available version, malformed dependencies
+            are reported with their text as name and no version
+    """
+    packages = list(packages)
+    fields = tuple(fields)
+    versions: Dict[str, str] = {
+        package["Package"]: package["Version"]
+        for package in packages
+        if "Package" in package and "Version" in package
+    }
+    versions.update(available or {})
+
+    verdicts: Dict[Tuple[Dependency, str], bool] = {}
+    unsatisfied = []
+    for package in packages:
+        name = package.get("Package")
+        if name is None:
+            continue
+
+        for field in fields:
+            value = package.get(field)
+            if not value:
+                continue
+
+            dependencies, invalid = parse_valid_dependencies(value)
+            for item in invalid:
+                unsatisfied.append(Unsatisfied(name, field, Dependency(item), None))
+
+            for dependency in dependencies:
+                version = versions.get(dependency.name)
+                if version is None:
+                    if dependency.name not in BASE_PACKAGES:
+                        unsatisfied.append(Unsatisfied(name, field, dependency, None))
+                    continue
+
+                key = (dependency, version)
+                verdict = verdicts.get(key)
+                if verdict is None:
+                    try:
+                        verdict = verdicts[key] = satisfies(version, dependency)
+                    except ValueError:
+                        verdict = verdicts[key] = False
+
+                if not verdict:
+                    unsatisfied.append(Unsatisfied(name, field, dependency, version))
+
+    return unsatisfied
@@ -7,3 +7,15 @@ class DescriptionNotFound(TarError):
 
 class NotTarFile(TarError):
     pass
+
+
+class IndexFormatError(ValueError):
+    pass
+
+
+class DependencyCycle(ValueError):
+    pass
+
+
+class FetchError(OSError):
+    pass
@@ -0,0 +1,244 @@
+from array import array
+from collections import deque
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from pycran.depends import parse_valid_dependencies
+from pycran.errors import DependencyCycle
+
+DEPENDS = 1
+IMPORTS = 2
+LINKING_TO = 4
+SUGGESTS = 8
+ENHANCES = 16
+
+# Dependencies which have to be installed before the package
+REQUIRED = DEPENDS | IMPORTS | LINKING_TO
+ALL = REQUIRED | SUGGESTS | ENHANCES
+
+FIELD_KINDS = {
+    "Depends": DEPENDS,
+    "Imports": IMPORTS,
+    "LinkingTo": LINKING_TO,
+    "Suggests": SUGGESTS,
+    "Enhances": ENHANCES,
+}
+
+
+def compressed_rows(
+    size: int, edges: Dict[Tuple[int, int], int]
+) -> Tuple[array, array, array]:
+    """Build compressed sparse row adjacency from edges
+    Args:
+        size (int): number of nodes
+        edges (Dict[Tuple[int, int], int]): kind mask of every edge
+
+    Returns:
+        (Tuple[array, array, array]): row offsets, targets and kinds of edges
+    """
+    offsets = array("l", [0]) * (size + 1)
+    for source, _target in edges:
+        offsets[source + 1] += 1
+
+    for node in range(size):
+        offsets[node + 1] += offsets[node]
+
+    targets = array("l", [0]) * len(edges)
+    kinds = array("B", [0]) * len(edges)
+    position = array("l", offsets[:-1])
+    for (source, target), kind in edges.items():
+        targets[position[source]] = target
+        kinds[position[source]] = kind
+        position[source] += 1
+
+    return offsets, targets, kinds
+
+
+class DependencyGraph:
+    """Integer indexed dependency graph of packages
+
+    Packages are numbered in the order they were given and edges are
+    stored as compressed sparse rows for both directions, each edge
+    keeps a mask of fields it comes from, see `DEPENDS`, `IMPORTS` etc.
+    Dependencies on packages missing from the index are ignored.
+    """
+
+    def __init__(self, names: List[str], edges: Dict[Tuple[int, int], int]):
+        self.names = names
+        self.ids = {name: node for node, name in enumerate(names)}
+        size = len(names)
+        self.offsets, self.targets, self.kinds = compressed_rows(size, edges)
+        reverse = {(target, source): kind for (source, target), kind in edges.items()}
+        (
+            self.reverse_offsets,
+            self.reverse_targets,
+            self.reverse_kinds,
+        ) = compressed_rows(size, reverse)
+
+    @classmethod
+    def from_packages(cls, packages: Iterable[Mapping]) -> "DependencyGraph":
+        """Build graph from parsed packages
+        Note: if a package is listed more than once the first entry is used,
+              malformed items of dependency fields are skipped.
+        Args:
+            packages (Iterable[Mapping]): parsed packages
+
+        Returns:
+            (DependencyGraph): dependency graph
+        """
+        names: List[str] = []
+        ids: Dict[str, int] = {}
+        fields: List[Mapping] = []
+        for package in packages:
+            name = package.get("Package")
+            if name and name not in ids:
+                ids[name] = len(names)
+                names.append(name)
+                fields.append(package)
+
+        edges: Dict[Tuple[int, int], int] = {}
+        for source, package in enumerate(fields):
+            for field, kind in FIELD_KINDS.items():
+                value = package.get(field)
+                if not value:
+                    continue
+
+                dependencies, _invalid = parse_valid_dependencies(value)
+                for dependency in dependencies:
+                    target = ids.get(dependency.name)
+                    if target is not None and target != source:
+                        edges[source, target] = edges.get((source, target), 0) | kind
+
+        return cls(names, edges)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.ids
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def _nodes(self, names: Iterable[str]) -> List[int]:
+        # repeated names are kept once in their first position
+        try:
+            return list(dict.fromkeys(self.ids[name] for name in names))
+        except KeyError as e:
+            raise KeyError(f"Package {e.args[0]} is not in the graph.") from None
+
+    def _walk(
+        self, nodes: List[int], kinds: int, reverse: bool, recursive: bool
+    ) -> List[int]:
+        if reverse:
+            offsets, targets, masks = (
+                self.reverse_offsets,
+                self.reverse_targets,
+                self.reverse_kinds,
+            )
+        else:
+            offsets, targets, masks = self.offsets, self.targets, self.kinds
+
+        seen = bytearray(len(self.names))
+        for node in nodes:
+            seen[node] = 1
+
+        found = []
+        queue = deque(nodes)
+        while queue:
+            node = queue.popleft()
+            for edge in range(offsets[node], offsets[node + 1]):
+                target = targets[edge]
+                if masks[edge] & kinds and not seen[target]:
+                    seen[target] = 1
+                    found.append(target)
+                    if recursive:
+                        queue.append(target)
+
+        return found
+
+    def dependencies(
+        self, name: str, kinds: int = REQUIRED, recursive: bool = False
+    ) -> List[str]:
+        """Dependencies of the package
+        Args:
+            name (str): package name
+            kinds (int): mask of dependency kinds to follow
+            recursive (bool): include transitive dependencies
+
+        Returns:
+            (List[str]): dependency names in breadth first order
+        """
+        nodes = self._walk(self._nodes([name]), kinds, False, recursive)
+        return [self.names[node] for node in nodes]
+
+    def reverse_dependencies(
+        self, name: str, kinds: int = REQUIRED, recursive: bool = False
+    ) -> List[str]:
+        """Packages depending on the package
+        Args:
+            name (str): package name
+            kinds (int): mask of dependency kinds to follow
+            recursive (bool): include packages depending on it indirectly
+
+        Returns:
+            (List[str]): names of dependent packages in breadth first order
+        """
+        nodes = self._walk(self._nodes([name]), kinds, True, recursive)
+        return [self.names[node] for node in nodes]
+
+    def closure(self, names: Iterable[str], kinds: int = REQUIRED) -> List[str]:
+        """Packages with all their transitive dependencies"""
+        nodes = self._nodes(names)
+        nodes += self._walk(nodes, kinds, False, True)
+        return [self.names[node] for node in nodes]
+
+    def install_order(
+        self, names: Optional[Iterable[str]] = None, kinds: int = REQUIRED
+    ) -> List[str]:
+        """Order packages so that dependencies come first
+        Args:
+            names (Optional[Iterable[str]]): packages to install together
+                with their dependencies, defaults to all packages
+            kinds (int): mask of dependency kinds to follow
+
+        Returns:
+            (List[str]): package names in installation order
+        """
+        if names is None:
+            nodes = list(range(len(self.names)))
+        else:
+            nodes = self._nodes(self.closure(names, kinds))
+
+        selected = bytearray(len(self.names))
+        for node in nodes:
+            selected[node] = 1
+
+        offsets, targets, masks = self.offsets, self.targets, self.kinds
+        pending = array("l", [0]) * len(self.names)
+        for node in nodes:
+            pending[node] = sum(
+                1
+                for edge in range(offsets[node], offsets[node + 1])
+                if masks[edge] & kinds and selected[targets[edge]]
+            )
+
+        ready = deque(node for node in nodes if not pending[node])
+        order = []
+        while ready:
+            node = ready.popleft()
+            order.append(node)
+            for edge in range(
+                self.reverse_offsets[node], self.reverse_offsets[node + 1]
+            ):
+                dependent = self.reverse_targets[edge]
+                if self.reverse_kinds[edge] & kinds and selected[dependent]:
+                    pending[dependent] -= 1
+                    if not pending[dependent]:
+                        ready.append(dependent)
+
+        if len(order) < len(nodes):
+            cycle = sorted(self.names[node] for node in nodes if pending[node])
+            raise DependencyCycle(f"Dependency cycle between {', '.join(cycle)}.")
+
+        return [self.names[node] for node in order]
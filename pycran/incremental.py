@@ -0,0 +1,125 @@
+import hashlib
+import re
+from typing import Collection, Dict, List, NamedTuple, Optional
+
+from pycran.parser import parse_records
+from pycran.typings import BytesOrString
+from pycran.util import decode_text, split_lines
+
+# Fingerprints map package names to digests of stanzas defining them,
+# a name repeated in the package list has a digest per stanza
+Fingerprints = Dict[str, List[str]]
+
+STANZA_SEPARATOR = re.compile(rb"\n(?:[ \t\r]*\n)+")
+
+
+class PackagesDiff(NamedTuple):
+    added: List[Dict]
+    changed: List[Dict]
+    removed: List[str]
+    fingerprints: Fingerprints
+
+
+def split_stanzas(data: BytesOrString) -> List[bytes]:
+    """Split raw PACKAGES data on blank lines
+    Args:
+        data (BytesOrString): raw text from the package list
+
+    Returns:
+        (List[bytes]): stanzas with surrounding whitespace stripped
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+
+    stanzas = (stanza.strip() for stanza in STANZA_SEPARATOR.split(data))
+    return [stanza for stanza in stanzas if stanza]
+
+
+def digest(stanza: bytes) -> str:
+    """Stable fingerprint of raw stanza"""
+    return hashlib.blake2b(stanza, digest_size=16).hexdigest()
+
+
+def parse_stanza(stanza: bytes, fields: Optional[Collection[str]] = None) -> List[Dict]:
+    """Parse packages of a stanza in the same way as `pycran.parse` does,
+    packages without `Package` field are left out.
+
+    Args:
+        stanza (bytes): raw stanza
+        fields (Optional[Collection[str]]): fields to keep, all by default
+
+    Returns:
+        (List[Dict]): packages defined by the stanza
+    """
+    lines = split_lines(decode_text(stanza))
+    return [
+        package
+        for package in parse_records(lines, fields=fields)
+        if "Package" in package
+    ]
+
+
+def stanza_names(packages: List[Dict]) -> List[str]:
+    """Distinct package names of a stanza in order"""
+    return list(dict.fromkeys(package["Package"] for package in packages))
+
+
+def fingerprint(data: BytesOrString) -> Fingerprints:
+    """Compute fingerprints of every stanza parsing only package names,
+    result is JSON serializable so it can be stored between syncs.
+
+    Args:
+        data (BytesOrString): raw text from the package list
+
+    Returns:
+        (Fingerprints): stanza digests by package name
+    """
+    fingerprints: Fingerprints = {}
+    for stanza in split_stanzas(data):
+        key = digest(stanza)
+        for name in stanza_names(parse_stanza(stanza, ["Package"])):
+            fingerprints.setdefault(name, []).append(key)
+
+    return fingerprints
+
+
+def diff(data: BytesOrString, previous: Fingerprints) -> PackagesDiff:
+    """Compare new package list with fingerprints of the previous one,
+    only stanzas which are new or changed since then are parsed.
+
+    Args:
+        data (BytesOrString): raw text from the new package list
+        previous (Fingerprints): fingerprints of the previous package list
+
+    Returns:
+        (PackagesDiff): added and changed packages as dictionaries,
+            names of packages no longer in the list
+            and fingerprints of the new list
+    """
+    # names of unchanged stanzas are known without parsing them
+    known: Dict[str, List[str]] = {}
+    for name, keys in previous.items():
+        for key in keys:
+            found = known.setdefault(key, [])
+            if name not in found:
+                found.append(name)
+
+    fingerprints: Fingerprints = {}
+    packages: List[Dict] = []
+    for stanza in split_stanzas(data):
+        key = digest(stanza)
+        names = known.get(key)
+        if names is None:
+            parsed = parse_stanza(stanza)
+            names = stanza_names(parsed)
+            packages.extend(parsed)
+
+        for name in names:
+            fingerprints.setdefault(name, []).append(key)
+
+    return PackagesDiff(
+        added=[package for package in packages if package["Package"] not in previous],
+        changed=[package for package in packages if package["Package"] in previous],
+        removed=sorted(name for name in previous if name not in fingerprints),
+        fingerprints=fingerprints,
+    )
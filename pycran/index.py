@@ -0,0 +1,233 @@
+import mmap
+import os
+import struct
+from typing import BinaryIO, Generator, List, Mapping, Optional, Tuple
+
+from pycran import decode
+from pycran.errors import IndexFormatError
+from pycran.util import as_string
+
+MAGIC = b"PYCRANIX"
+VERSION = 1
+
+# magic, version, number of entries, source size and modification time
+HEADER = struct.Struct("<8sIQQQ")
+# name offset in names block, name length, stanza offset and length
+ENTRY = struct.Struct("<QIQQ")
+
+Entry = Tuple[bytes, int, int]
+
+
+def scan_stanzas(fp: BinaryIO) -> Generator[Entry, None, None]:
+    """Scan PACKAGES file and find where every package stanza is
+    Note: stanzas are separated by blank lines, a repeated `Package`
+          field also starts a new stanza to handle non-separated data.
+    Args:
+        fp (BinaryIO): binary file object
+
+    Returns:
+        (Generator): package name, byte offset and length of each stanza
+    """
+    position = 0
+    start = end = -1
+    name: Optional[bytes] = None
+
+    for line in fp:
+        stripped = line.strip()
+        if stripped.startswith(b"Package:") and name is not None:
+            yield name, start, end - start
+            start = -1
+
+        if stripped:
+            if start < 0:
+                start = position
+                name = None
+            if stripped.startswith(b"Package:"):
+                name = stripped[8:].strip()
+            end = position + len(line)
+        elif start >= 0:
+            if name is not None:
+                yield name, start, end - start
+            start = -1
+            name = None
+
+        position += len(line)
+
+    if start >= 0 and name is not None:
+        yield name, start, end - start
+
+
+def index_path(source: str) -> str:
+    """Default sidecar path of the index for PACKAGES file"""
+    return f"{source}.idx"
+
+
+def build_index(source: str, sidecar: Optional[str] = None) -> str:
+    """Scan PACKAGES file once and write lookup index as a sidecar file
+    Args:
+        source (str): path to PACKAGES file
+        sidecar (Optional[str]): index path, defaults to `<source>.idx`
+
+    Returns:
+        (str): path to the written index
+    """
+    sidecar = sidecar or index_path(source)
+    with open(source, "rb") as fp:
+        stat = os.fstat(fp.fileno())
+        # sorting is stable so duplicated names keep file order
+        entries = sorted(scan_stanzas(fp), key=lambda entry: entry[0])
+
+    names: List[bytes] = []
+    table: List[bytes] = []
+    names_offset = 0
+    for name, offset, length in entries:
+        table.append(ENTRY.pack(names_offset, len(name), offset, length))
+        names.append(name)
+        names_offset += len(name)
+
+    # processes starting together may build the index at the same time,
+    # each one writes its own file and readers only see complete ones
+    temporary = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as fp:
+            fp.write(
+                HEADER.pack(
+                    MAGIC, VERSION, len(entries), stat.st_size, stat.st_mtime_ns
+                )
+            )
+            fp.write(b"".join(table))
+            fp.write(b"".join(names))
+
+        os.replace(temporary, sidecar)
+    finally:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+
+    return sidecar
+
+
+def _map(path: str) -> Tuple[BinaryIO, bytes]:
+    fp = open(path, "rb")
+    if os.fstat(fp.fileno()).st_size == 0:
+        return fp, b""
+
+    return fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)  # type: ignore
+
+
+class PackageIndex:
+    """Random access to package records of PACKAGES file
+
+    Both the sidecar index and the source file are memory mapped,
+    lookups do a binary search over the sorted package names and
+    decode only the requested stanza. The index is rebuilt if the
+    sidecar is missing or the source file changed since it was built.
+    """
+
+    def __init__(self, source: str, sidecar: Optional[str] = None):
+        self.source = source
+        self.sidecar = sidecar or index_path(source)
+        if not self.is_fresh():
+            build_index(source, self.sidecar)
+
+        self._index_file, self._index = _map(self.sidecar)
+        self._source_file, self._data = _map(source)
+        _magic, _version, self.size, _size, _mtime = HEADER.unpack_from(self._index)
+        self._names_offset = HEADER.size + self.size * ENTRY.size
+
+    def is_fresh(self) -> bool:
+        """Check if the sidecar index matches the source file
+        Note: files which are not package indexes are never overwritten.
+        """
+        if not os.path.exists(self.sidecar):
+            return False
+
+        with open(self.sidecar, "rb") as fp:
+            header = fp.read(HEADER.size)
+
+        if len(header) < HEADER.size or not header.startswith(MAGIC):
+            raise IndexFormatError(f"File {self.sidecar} is not a package index.")
+
+        stat = os.stat(self.source)
+        _magic, version, _count, size, mtime = HEADER.unpack(header)
+        return (version, size, mtime) == (VERSION, stat.st_size, stat.st_mtime_ns)
+
+    def _entry(self, position: int) -> Tuple[bytes, int, int]:
+        name_offset, name_length, offset, length = ENTRY.unpack_from(
+            self._index, HEADER.size + position * ENTRY.size
+        )
+        start = self._names_offset + name_offset
+        return self._index[start : start + name_length], offset, length
+
+    def _search(self, name: bytes) -> int:
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < name:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def spans(self, name: str) -> Generator[Tuple[int, int], None, None]:
+        """Byte offsets and lengths of stanzas for package in file order"""
+        key = name.encode("utf-8")
+        for position in range(self._search(key), self.size):
+            found, offset, length = self._entry(position)
+            if found != key:
+                return
+            yield offset, length
+
+    def span(self, name: str) -> Optional[Tuple[int, int]]:
+        """Byte offset and length of the first stanza for package"""
+        return next(self.spans(name), None)
+
+    def lookup(self, name: str, compact: bool = False) -> Optional[Mapping]:
+        """Decode metadata of the package
+        Args:
+            name (str): package name
+            compact (bool): return `PackageRecord` instead of dictionary
+
+        Returns:
+            (Optional[Mapping]): package metadata or `None` if not found
+        """
+        span = self.span(name)
+        if span is None:
+            return None
+
+        offset, length = span
+        return decode(self._data[offset : offset + length], compact)
+
+    def lookup_all(self, name: str, compact: bool = False) -> List[Mapping]:
+        """Decode metadata of every stanza for package,
+        package lists may have the same package listed more than once.
+        """
+        return [
+            decode(self._data[offset : offset + length], compact)  # type: ignore
+            for offset, length in self.spans(name)
+        ]
+
+    def names(self) -> Generator[str, None, None]:
+        """Iterate over indexed package names in sorted order"""
+        for position in range(self.size):
+            yield as_string(self._entry(position)[0])
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self.span(name) is not None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def close(self):
+        for mapped in (self._index, self._data):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+        self._index_file.close()
+        self._source_file.close()
+
+    def __enter__(self) -> "PackageIndex":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,206 @@
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Dict, Generator, Iterable, Iterator, List, Optional
+
+# Stages
+PARSE = "parse"
+DECODE = "decode"
+DECOMPRESS = "decompress"
+FIND_DESCRIPTION = "find_description"
+READ_DESCRIPTION = "read_description"
+FROM_FILE = "from_file"
+
+# Counters
+BYTES_READ = "bytes_read"
+LINES = "lines"
+CONTINUATION_LINES = "continuation_lines"
+RECORDS = "records"
+ERRORS = "errors"
+
+# Registered observers, instrumented code checks this list
+# before doing any work so disabled metrics cost a single test.
+observers: List["Observer"] = []
+
+
+class Observer:
+    """Receiver of metrics, subclass it to export metrics elsewhere.
+
+    Stages may nest, for example `parse` includes the time spent
+    decoding and decompressing data while records are iterated.
+    Methods are called from the thread doing the work.
+    """
+
+    def timing(self, stage: str, seconds: float) -> None:
+        """Called once a stage has finished
+        Args:
+            stage (str): stage name like `parse` or `read_description`
+            seconds (float): time spent in the stage
+        """
+
+    def count(self, counter: str, value: int) -> None:
+        """Called to increase a counter
+        Args:
+            counter (str): counter name like `records` or `bytes_read`
+            value (int): increment
+        """
+
+
+class Metrics(Observer):
+    """Observer which sums up timings and counters"""
+
+    def __init__(self) -> None:
+        self.timings: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+
+    def timing(self, stage: str, seconds: float) -> None:
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def count(self, counter: str, value: int) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Return copy of collected metrics"""
+        return {
+            "timings": dict(self.timings),
+            "calls": dict(self.calls),
+            "counters": dict(self.counters),
+        }
+
+
+def subscribe(observer: Observer) -> None:
+    """Start sending metrics of every thread to the observer"""
+    observers.append(observer)
+
+
+def unsubscribe(observer: Observer) -> None:
+    """Stop sending metrics to the observer"""
+    observers.remove(observer)
+
+
+@contextmanager
+def observe(observer: Optional[Observer] = None) -> Generator[Any, None, None]:
+    """Collect metrics within the block
+
+        with pycran.metrics.observe() as metrics:
+            pycran.from_file("A3_1.0.0.tar.gz")
+
+        metrics.timings["read_description"]
+
+    Args:
+        observer (Optional[Observer]): receiver of metrics,
+            new `Metrics` instance by default
+
+    Returns:
+        (Generator): the observer
+    """
+    if observer is None:
+        observer = Metrics()
+
+    subscribe(observer)
+    try:
+        yield observer
+    finally:
+        unsubscribe(observer)
+
+
+def count(counter: str, value: int = 1) -> None:
+    for observer in observers:
+        observer.count(counter, value)
+
+
+def timing(stage: str, seconds: float) -> None:
+    for observer in observers:
+        observer.timing(stage, seconds)
+
+
+class timer:
+    """Context manager reporting time spent in the block
+    Args:
+        stage (str): stage name
+        errors (bool): count exceptions raised by the block as errors
+    """
+
+    __slots__ = ("stage", "errors", "start")
+
+    def __init__(self, stage: str, errors: bool = False):
+        self.stage = stage
+        self.errors = errors
+        self.start = 0.0
+
+    def __enter__(self) -> "timer":
+        if observers:
+            self.start = perf_counter()
+        return self
+
+    def __exit__(self, error_type: Any, *exc_info: Any) -> None:
+        if observers and self.start:
+            timing(self.stage, perf_counter() - self.start)
+            if self.errors and error_type is not None:
+                count(ERRORS)
+
+
+def timed(stage: str, items: Iterable) -> Iterator:
+    """Report time spent producing items of the iterable
+    Args:
+        stage (str): stage name
+        items (Iterable): lazily computed items
+
+    Returns:
+        (Iterator): the same items
+    """
+    iterator = iter(items)
+    elapsed = 0.0
+    try:
+        while True:
+            start = perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += perf_counter() - start
+            yield item
+    finally:
+        timing(stage, elapsed)
+
+
+def counted_records(packages: Iterable) -> Iterator:
+    """Report time spent parsing and the number of records"""
+    records = 0
+    try:
+        for package in timed(PARSE, packages):
+            records += 1
+            yield package
+    finally:
+        count(RECORDS, records)
+
+
+def counted_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Report the number of lines and continuation lines,
+    the latter start with whitespace and are not blank.
+    """
+    total = continued = 0
+    try:
+        for line in lines:
+            total += 1
+            if line[:1] in (" ", "\t") and not line.isspace():
+                continued += 1
+            yield line
+    finally:
+        count(LINES, total)
+        count(CONTINUATION_LINES, continued)
+
+
+def counted_texts(texts: Iterable[str]) -> Iterator[str]:
+    """Report the number of lines and continuation lines of text pieces"""
+    total = continued = 0
+    try:
+        for text in texts:
+            total += text.count("\n") + (text[-1:] not in ("", "\n"))
+            continued += text.count("\n ") + text.count("\n\t")
+            yield text
+    finally:
+        count(LINES, total)
+        count(CONTINUATION_LINES, continued)
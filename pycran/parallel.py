@@ -0,0 +1,200 @@
+import mmap
+import os
+import re
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from pycran.compression import MAGIC_SIZE, decompress, detect_compression
+from pycran.parser import LineParser, parse_records
+from pycran.records import compact_records
+from pycran.scanner import chunk_lines, parse_buffer
+from pycran.typings import BytesOrString
+from pycran.util import decode_text, split_lines
+
+SHARD_SIZE = 4 * 1024 * 1024
+
+# Shards start at `Package` field following a blank line,
+# the default parser always starts a new package there
+# as long as the previous one has `Package` field too.
+BOUNDARY = re.compile(rb"\n[ \t]*\r?\n(?=[ \t]*Package[ \t]*:)")
+
+# Directory backed by memory on Linux
+SHARED_DIRECTORY = "/dev/shm"
+
+# Start and end offsets of shard
+Span = Tuple[int, int]
+
+
+def shard_spans(data: Any, shard_size: int = SHARD_SIZE) -> List[Span]:
+    """Split data into shards on package boundaries
+    Args:
+        data (Any): bytes like object
+        shard_size (int): minimal size of a shard
+
+    Returns:
+        (List[Span]): start and end offsets of shards
+    """
+    spans = []
+    start = 0
+    while start < len(data):
+        match = BOUNDARY.search(data, start + shard_size)
+        end = match.end() if match else len(data)
+        spans.append((start, end))
+        start = end
+
+    return spans
+
+
+def shard_lines(data: Any, span: Span, text: bool) -> List[str]:
+    """Split shard into lines in the same way `pycran.parse` does"""
+    start, end = span
+    shard = data[start:end]
+    if text:
+        return shard.decode("utf-8").splitlines()
+
+    return split_lines(decode_text(shard))
+
+
+def parse_shard(filename: str, span: Span, text: bool, strict: bool) -> Tuple:
+    """Parse a single shard of the shared file
+    Args:
+        filename (str): path to the shared file
+        span (Span): start and end offsets of shard
+        text (bool): data was given as string
+        strict (bool): split packages on blank lines only
+
+    Returns:
+        (Tuple): packages and whether the last one can be closed
+            at the shard end without looking at the next shard
+    """
+    with open(filename, "rb") as fp:
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            lines = shard_lines(data, span, text)
+
+    packages = list(parse_records(lines, strict))
+    return packages, strict or not packages or "Package" in packages[-1]
+
+
+def share(data: bytes) -> str:
+    """Write data to a temporary file which workers can map into memory"""
+    directory = SHARED_DIRECTORY if os.path.isdir(SHARED_DIRECTORY) else None
+    with tempfile.NamedTemporaryFile(
+        prefix="pycran-", dir=directory, delete=False
+    ) as fp:
+        fp.write(data)
+
+    return fp.name
+
+
+def merge(
+    data: bytes,
+    spans: List[Span],
+    results: Iterator[Tuple],
+    text: bool,
+) -> Iterator[Dict]:
+    """Yield packages of shards in order, if the last package of a shard
+    misses `Package` field the default parser would continue it
+    in the next shard so such shards are parsed again sequentially.
+    Note: in strict mode shards always end with a complete stanza.
+    """
+    parser: Optional[LineParser] = None
+    for span, (packages, closed) in zip(spans, results):
+        if parser is None:
+            if closed:
+                yield from packages
+                continue
+
+            parser = LineParser()
+
+        yield from parser.feed(shard_lines(data, span, text))
+        if not parser.field or "Package" in parser.fields:
+            yield from parser.close()
+            parser = None
+
+    if parser is not None:
+        yield from parser.close()
+
+
+def parse_parallel(
+    data: BytesOrString,
+    workers: Optional[int] = None,
+    strict: bool = False,
+    compact: bool = False,
+    shard_size: int = SHARD_SIZE,
+) -> Iterator:
+    """Parse large package list using a process pool,
+    data is split into shards on package boundaries and shared
+    with workers via memory mapped file, packages are yielded
+    in the same order and form as `pycran.parse` returns them.
+
+    Args:
+        data (BytesOrString): raw text from the package list
+        workers (Optional[int]): number of processes, defaults to CPU count
+        strict (bool): split packages on blank lines only, see `pycran.parse`
+        compact (bool): yield `PackageRecord` instead of dictionaries
+        shard_size (int): approximate size of data parsed by a single task
+
+    Returns:
+        (Iterator): each entry from packages as dictionary
+    """
+    packages = parse_shards(data, workers, strict, shard_size)
+    return compact_records(packages) if compact else packages
+
+
+def parse_sequential(data: BytesOrString, strict: bool) -> Iterator[Dict]:
+    """Parse data in this process in the same way as `pycran.parse` does"""
+    if isinstance(data, str):
+        return parse_records(data.splitlines(), strict)
+
+    if detect_compression(bytes(data[:MAGIC_SIZE])):
+        return parse_records(chunk_lines(decompress(data)), strict)
+
+    return parse_buffer(data, strict)
+
+
+def parse_shards(
+    data: BytesOrString, workers: Optional[int], strict: bool, shard_size: int
+) -> Iterator[Dict]:
+    # starting workers and sharing data costs more than it saves
+    # without spare processors or with a single shard
+    if (workers is not None and workers <= 1) or os.cpu_count() == 1:
+        yield from parse_sequential(data, strict)
+        return
+
+    text = isinstance(data, str)
+    if text:
+        buffer = data.encode("utf-8")  # type: ignore
+    elif detect_compression(bytes(data[:MAGIC_SIZE])):  # type: ignore
+        buffer = b"".join(decompress(data))
+    else:
+        buffer = data  # type: ignore
+
+    spans = shard_spans(buffer, shard_size)
+    workers = min(workers or os.cpu_count() or 1, len(spans))
+    if workers <= 1:
+        yield from parse_sequential(data if text else buffer, strict)
+        return
+
+    filename = share(buffer)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+
+            def results() -> Iterator[Tuple]:
+                # only a couple of shards per worker are in flight
+                # so parsed packages do not pile up in memory
+                pending: Deque[Future] = deque()
+                for span in spans:
+                    pending.append(
+                        executor.submit(parse_shard, filename, span, text, strict)
+                    )
+                    if len(pending) >= workers * 2:  # type: ignore
+                        yield pending.popleft().result()
+
+                while pending:
+                    yield pending.popleft().result()
+
+            yield from merge(buffer, spans, results(), text)
+    finally:
+        os.unlink(filename)
@@ -0,0 +1,352 @@
+import os
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+)
+
+from pycran.metrics import counted_lines, counted_records, observers
+from pycran.records import compact_records
+from pycran.typings import Conditions
+from pycran.util import normalize
+
+
+class LineParser:
+    """Incremental parser of metadata lines,
+    a new package starts once one of its fields repeats.
+
+    The field being read is kept as state and its continuation
+    lines are collected in a buffer which is joined only once
+    the next field starts, so wrapped values cost linear time.
+    State is kept between `feed` calls so lines may come in batches.
+
+    Args:
+        fields (Optional[Collection[str]]): fields to keep, by default all,
+            values of other fields are not built
+    """
+
+    def __init__(self, fields: Optional[Collection[str]] = None):
+        self.wanted = None if fields is None else frozenset(fields)
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop parsed state and start over"""
+        self.fields: Set[str] = set()
+        self.package: Dict[str, str] = {}
+        self.field = ""
+        self.buffer: List[str] = []
+
+    def feed(self, lines: Iterable[str]) -> Generator[Dict, None, None]:
+        """Parse next batch of lines
+        Args:
+            lines (Iterable[str]): decoded metadata lines
+
+        Returns:
+            (Generator): packages completed by these lines
+        """
+        fields, package, field, buffer = (
+            self.fields,
+            self.package,
+            self.field,
+            self.buffer,
+        )
+        wanted = self.wanted
+
+        # We want to iterate over each line and accumulate
+        # keys in dictionary, once we meet the same key
+        # in our dictionary we have a single package
+        # metadata parsed so we yield and repeat again.
+        try:
+            for line in lines:
+                stripped = line.strip()
+                if not stripped:
+                    continue
+
+                name, separator, value = line.partition(":")
+                if separator:
+                    name = name.strip()
+                    if name and name[0].isalpha():
+                        if field:
+                            package[field] = " ".join(buffer)
+
+                        # fields which are not kept still end packages
+                        # once they repeat but their lines are ignored
+                        if name in fields:
+                            completed = package
+                            fields = {name}
+                            package = {}
+                            field = name if wanted is None or name in wanted else ""
+                            buffer = [value.strip()]
+                            yield completed
+                            continue
+
+                        fields.add(name)
+                        field = name if wanted is None or name in wanted else ""
+                        buffer = [value.strip()]
+                        continue
+
+                # Here we want to parse dangling lines
+                # like the ones with long dependency
+                # list, `R (>= 2.15.0), xtable, pbapply ... \n    and more`
+                if field:
+                    buffer.append(stripped)
+        finally:
+            self.fields, self.package, self.field, self.buffer = (
+                fields,
+                package,
+                field,
+                buffer,
+            )
+
+    def close(self) -> Generator[Dict, None, None]:
+        """Finish parsing and return the last package if any"""
+        # We also need to return the metadata for
+        # the last parsed package.
+        package, field, started = self.package, self.field, bool(self.fields)
+        if field:
+            package[field] = " ".join(self.buffer)
+
+        self.reset()
+        if started:
+            yield package
+
+
+class StanzaParser:
+    """Incremental parser of blank line separated metadata lines
+    as defined by Debian control file format.
+
+    Each stanza is built once in place, unlike `LineParser`
+    field names are not tracked to detect record boundaries
+    so stanzas having different sets of fields never merge.
+
+    Args:
+        fields (Optional[Collection[str]]): fields to keep, by default all,
+            values of other fields are not built
+    """
+
+    def __init__(self, fields: Optional[Collection[str]] = None):
+        self.wanted = None if fields is None else frozenset(fields)
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop parsed state and start over"""
+        self.package: Dict[str, str] = {}
+        self.field = ""
+        # whether the stanza has any fields, kept or not
+        self.started = False
+        # Most fields fit on a single line so the buffer
+        # is only allocated once a continuation line shows up.
+        self.buffer: Optional[List[str]] = None
+
+    def feed(self, lines: Iterable[str]) -> Generator[Dict, None, None]:
+        """Parse next batch of lines
+        Args:
+            lines (Iterable[str]): decoded metadata lines
+
+        Returns:
+            (Generator): stanzas completed by these lines
+        """
+        package, field, buffer = self.package, self.field, self.buffer
+        started, wanted = self.started, self.wanted
+        try:
+            for line in lines:
+                stripped = line.strip()
+                if not stripped:
+                    if started:
+                        if buffer:
+                            package[field] = " ".join(buffer)
+                        completed = package
+                        package = {}
+                        field = ""
+                        buffer = None
+                        started = False
+                        yield completed
+                    continue
+
+                # indented lines always continue the field in DCF format
+                name, separator, value = line.partition(":")
+                if separator and line[:1] not in (" ", "\t"):
+                    name = name.strip()
+                    if name and name[0].isalpha():
+                        if buffer:
+                            package[field] = " ".join(buffer)
+                            buffer = None
+
+                        started = True
+                        if wanted is None or name in wanted:
+                            field = name
+                            package[name] = value.strip()
+                        else:
+                            field = ""
+                        continue
+
+                if field:
+                    if buffer is None:
+                        buffer = [package[field]]
+                    buffer.append(stripped)
+        finally:
+            self.package, self.field, self.buffer = package, field, buffer
+            self.started = started
+
+    def close(self) -> Generator[Dict, None, None]:
+        """Finish parsing and return the last stanza if any"""
+        package, field, started = self.package, self.field, self.started
+        if field and self.buffer:
+            package[field] = " ".join(self.buffer)
+
+        self.reset()
+        if started:
+            yield package
+
+
+def parse_lines(
+    lines: Iterable[str], fields: Optional[Collection[str]] = None
+) -> Generator[Dict, None, None]:
+    """Parse metadata lines and yield a dictionary per package,
+    a new package starts once one of its fields repeats.
+
+    Args:
+        lines (Iterable[str]): decoded metadata lines
+        fields (Optional[Collection[str]]): fields to keep, by default all
+
+    Returns:
+        (Generator): each entry from packages as dictionary
+    """
+    parser = LineParser(fields)
+    yield from parser.feed(lines)
+    yield from parser.close()
+
+
+def parse_stanzas(
+    lines: Iterable[str], fields: Optional[Collection[str]] = None
+) -> Generator[Dict, None, None]:
+    """Parse blank line separated metadata lines
+    and yield a dictionary per stanza.
+
+    Args:
+        lines (Iterable[str]): decoded metadata lines
+        fields (Optional[Collection[str]]): fields to keep, by default all
+
+    Returns:
+        (Generator): each stanza as dictionary
+    """
+    parser = StanzaParser(fields)
+    yield from parser.feed(lines)
+    yield from parser.close()
+
+
+# Compiled parsers with the same semantics are used once built
+# with `python setup.py build_ext`, set `PYCRAN_PURE_PYTHON=1`
+# environment variable to use the pure Python ones anyway.
+speedups: Any = None
+if not os.environ.get("PYCRAN_PURE_PYTHON"):
+    try:
+        from pycran import _speedups as speedups  # type: ignore
+    except ImportError:
+        pass
+
+BACKEND = "python" if speedups is None else "c"
+line_parser = parse_lines if speedups is None else speedups.parse_lines
+stanza_parser = parse_stanzas if speedups is None else speedups.parse_stanzas
+
+
+def predicates(where: Optional[Conditions]) -> Dict[str, Callable[[str], bool]]:
+    """Turn conditions into tests of field values
+    Args:
+        where (Optional[Conditions]): field names mapped to accepted value,
+            collection of accepted values or a callable testing the value
+
+    Returns:
+        (Dict[str, Callable[[str], bool]]): tests of every field
+    """
+    tests: Dict[str, Callable[[str], bool]] = {}
+    for field, condition in (where or {}).items():
+        if isinstance(condition, str):
+            tests[field] = condition.__eq__
+        elif callable(condition):
+            tests[field] = condition
+        else:
+            tests[field] = condition.__contains__
+
+    return tests
+
+
+def select(
+    packages: Iterable[Dict],
+    fields: Optional[Collection[str]] = None,
+    where: Optional[Conditions] = None,
+    raw: bool = False,
+) -> Iterator[Dict]:
+    """Filter and project parsed packages, in strict mode a field
+    repeated in the same stanza is tested by its last value which is the one kept.
+
+    Args:
+        packages (Iterable[Dict]): parsed packages
+        fields (Optional[Collection[str]]): fields to keep, all by default
+        where (Optional[Conditions]): conditions packages have to satisfy
+        raw (bool): values keep their continuation lines
+            and are normalized before testing them
+
+    Returns:
+        (Iterator[Dict]): selected fields of every matching package
+    """
+    tests = list(predicates(where).items())
+    wanted = None if fields is None else set(fields)
+    for package in packages:
+        for name, test in tests:
+            value = package.get(name)
+            if value is None or not test(normalize(value) if raw else value):
+                break
+        else:
+            if wanted is not None:
+                package = {
+                    name: value for name, value in package.items() if name in wanted
+                }
+            yield package
+
+
+def parse_records(
+    lines: Iterable[str],
+    strict: bool = False,
+    compact: bool = False,
+    fields: Optional[Collection[str]] = None,
+    where: Optional[Conditions] = None,
+) -> Iterator:
+    """Parse metadata lines with the requested options
+    Args:
+        lines (Iterable[str]): decoded metadata lines
+        strict (bool): split packages on blank lines only
+        compact (bool): yield `PackageRecord` instead of dictionaries
+        fields (Optional[Collection[str]]): fields to keep, all by default
+        where (Optional[Conditions]): conditions packages have to satisfy
+
+    Returns:
+        (Iterator): each entry from packages
+    """
+    if observers:
+        lines = counted_lines(lines)
+
+    packages: Iterator
+    parser = stanza_parser if strict else line_parser
+    if fields is not None or where:
+        # only kept and tested fields are built
+        kept = None if fields is None else set(fields)
+        needed = None if kept is None else kept | set(where or ())
+        packages = parser(lines, needed)
+        if where:
+            # fields which are only tested are dropped once tested
+            packages = select(packages, None if needed == kept else kept, where)
+    else:
+        packages = parser(lines)
+
+    if compact:
+        packages = compact_records(packages)
+
+    return counted_records(packages) if observers else packages
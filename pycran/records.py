@@ -0,0 +1,151 @@
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Generator, Iterable, Iterator, Optional
+
+from pycran.util import normalize
+
+# Fields present in almost every package record,
+# they are stored in slots instead of per record dictionary.
+COMMON_FIELDS = (
+    "Package",
+    "Version",
+    "Depends",
+    "Imports",
+    "LinkingTo",
+    "Suggests",
+    "License",
+    "MD5sum",
+    "NeedsCompilation",
+)
+
+# Fields having only a handful of distinct values across CRAN,
+# their values are interned so records share the same string.
+INTERNED_VALUES = {"License", "NeedsCompilation"}
+
+
+class PackageRecord(Mapping):
+    """Compact read-only package metadata record
+
+    Common fields are kept in slots and all the others
+    go to the overflow dictionary with interned field names.
+    Records compare equal to dictionaries having the same items,
+    common fields are iterated first in `COMMON_FIELDS` order.
+    """
+
+    __slots__ = COMMON_FIELDS + ("_extra",)
+
+    _extra: Optional[Dict[str, str]]
+
+    def __init__(self, metadata: "Mapping[str, str]"):
+        extra: Optional[Dict[str, str]] = None
+        for field, value in metadata.items():
+            if field in INTERNED_VALUES:
+                value = sys.intern(value)
+
+            if field in COMMON_FIELDS:
+                object.__setattr__(self, field, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[sys.intern(field)] = value
+
+        object.__setattr__(self, "_extra", extra)
+
+    def __getitem__(self, field: str) -> str:
+        if field in COMMON_FIELDS:
+            try:
+                return getattr(self, field)
+            except AttributeError:
+                raise KeyError(field) from None
+
+        if self._extra is None or field not in self._extra:
+            raise KeyError(field)
+
+        return self._extra[field]
+
+    def __contains__(self, field: Any) -> bool:
+        if field in COMMON_FIELDS:
+            return hasattr(self, field)
+
+        return self._extra is not None and field in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for field in COMMON_FIELDS:
+            if hasattr(self, field):
+                yield field
+
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        size = len(self._extra) if self._extra is not None else 0
+        return size + sum(1 for field in COMMON_FIELDS if hasattr(self, field))
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class LazyRecord(Mapping):
+    """Read-only package record keeping raw field values
+
+    Values are stored with their continuation lines as they
+    appear in the package list, a value is normalized on the first
+    access and cached afterwards.
+    """
+
+    __slots__ = ("_fields", "_values")
+
+    _fields: Dict[str, str]
+    _values: Dict[str, str]
+
+    def __init__(self, fields: Dict[str, str]):
+        """
+        Args:
+            fields (Dict[str, str]): raw field values
+                with their lines broken by `\\n`
+        """
+        self._fields = fields
+        self._values = {}
+
+    def __getitem__(self, field: str) -> str:
+        value = self._values.get(field)
+        if value is None:
+            value = self._fields[field]
+            value = normalize(value) if "\n" in value else value.strip()
+            self._values[field] = value
+
+        return value
+
+    def __contains__(self, field: Any) -> bool:
+        return field in self._fields
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __reduce__(self):
+        # values are materialized so the copy is a plain dictionary
+        return dict, (dict(self),)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+def compact_records(packages: Iterable[Dict]) -> Generator[PackageRecord, None, None]:
+    """Convert parsed package dictionaries to compact records
+    Args:
+        packages (Iterable[Dict]): parsed package dictionaries
+
+    Returns:
+        (Generator): each entry as `PackageRecord`
+    """
+    for package in packages:
+        yield PackageRecord(package)
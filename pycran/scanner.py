@@ -0,0 +1,315 @@
+import re
+from itertools import chain
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Set
+
+from pycran.metrics import DECODE, counted_records, counted_texts, observers, timer
+from pycran.parser import parse_records, select
+from pycran.records import LazyRecord
+from pycran.typings import Conditions
+from pycran.util import CHUNK_SIZE, NEWLINE, decode_text, iter_lines, split_lines
+
+# Line break which is not followed by a continuation line,
+# so every block holds a field line with its wrapped lines.
+BLOCK = re.compile(r"\n(?![ \t])")
+
+# Lone `\r` ends lines in `bytes.splitlines` as well
+LONE_CR = re.compile(rb"\r(?!\n)")
+
+# Line consisting of whitespace only, such lines end stanzas in strict mode
+BLANK_LINE = re.compile(r"\n\s*(?:\n|\Z)")
+
+# Characters which `str.splitlines` treats as line breaks besides `\r` and `\n`
+LINE_BREAKS = "\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+WINDOW_SIZE = 16 * CHUNK_SIZE
+
+
+def windows(chunks: Iterable[Any], size: int = WINDOW_SIZE) -> Iterator[bytes]:
+    """Regroup binary chunks into windows ending with a line break
+    which is not followed by a continuation line.
+
+    Windows end after blank lines so stanzas are decoded whole,
+    only windows of `WINDOW_SIZE` without any blank line end elsewhere.
+
+    Args:
+        chunks (Iterable[Any]): bytes like chunks of data
+        size (int): minimal size of a window
+
+    Returns:
+        (Iterator[bytes]): windows of data, the last one may end anywhere
+    """
+    parts: List[Any] = []
+    pending = 0
+    limit = size
+    for chunk in chunks:
+        parts.append(chunk)
+        pending += len(chunk)
+        if pending < limit:
+            continue
+
+        data = b"".join(parts)
+        # the next byte has to be known to tell if a line is continued
+        end = data.rfind(b"\n\n", 0, len(data) - 2) + 1
+        if end <= 0 or data[end + 1] in b" \t":
+            end = -1
+            if pending >= WINDOW_SIZE:
+                end = data.rfind(b"\n", 0, len(data) - 1)
+                while end >= 0 and data[end + 1] in b" \t":
+                    end = data.rfind(b"\n", 0, end)
+
+        if end < 0:
+            # wait for twice as much data so long stanzas are joined linear times
+            parts, pending, limit = [data], len(data), 2 * len(data)
+            continue
+
+        yield data[: end + 1]
+        parts, pending, limit = [data[end + 1 :]], len(data) - end - 1, size
+
+    if pending:
+        yield b"".join(parts)
+
+
+def decode_windows(chunks: Iterable[Any], size: int = WINDOW_SIZE) -> Iterator[str]:
+    """Decode binary chunks in windows with lines broken by `\\n` only,
+    other line breaks are the same as in `bytes.splitlines`.
+    """
+    for window in windows(chunks, size):
+        with timer(DECODE):
+            text = decode_text(window)
+        if b"\r" in window and LONE_CR.search(window):
+            text = NEWLINE.sub("\n", text)
+        yield text
+
+
+def buffer_slices(data: Any) -> Iterator[Any]:
+    """Slice bytes like object into chunks of window size"""
+    return (data[i : i + WINDOW_SIZE] for i in range(0, len(data), WINDOW_SIZE))
+
+
+def chunk_lines(chunks: Iterable[Any], size: int = WINDOW_SIZE) -> Iterator[str]:
+    """Decode binary chunks window by window and split windows into lines,
+    only a window of text is kept in memory at a time.
+
+    Args:
+        chunks (Iterable[Any]): bytes like chunks of UTF-8 text,
+            stanzas in other encodings have to declare `Encoding` field
+        size (int): minimal size of a window
+
+    Returns:
+        (Iterator[str]): lines split in the same way as `bytes.splitlines` does
+    """
+    # windows end with a line break so no line or `\r\n` spans two windows
+    for window in windows(chunks, size):
+        with timer(DECODE):
+            text = decode_text(window)
+        yield from split_lines(text)
+
+
+def buffer_lines(data: Any) -> Iterator[str]:
+    """Decode the buffer window by window and split windows into lines
+    Args:
+        data (Any): `bytes`, `memoryview` or `mmap` with UTF-8 text,
+            stanzas in other encodings have to declare `Encoding` field
+
+    Returns:
+        (Iterator[str]): lines split in the same way as `bytes.splitlines` does
+    """
+    return chunk_lines(buffer_slices(data))
+
+
+def stream_lines(chunks: Iterable[Any], size: int = WINDOW_SIZE) -> Iterator[str]:
+    """Split chunks of text into lines and decode binary ones in windows,
+    see `chunk_lines`.
+
+    Args:
+        chunks (Iterable[Any]): chunks of `str` or bytes like chunks
+        size (int): minimal size of a window of binary data
+
+    Returns:
+        (Iterator[str]): lines split in the same way as `bytes.splitlines` does
+    """
+    iterator = iter(chunks)
+    for first in iterator:
+        chunks = chain([first], iterator)
+        if isinstance(first, str):
+            return iter_lines(chunks)
+
+        return chunk_lines(chunks, size)
+
+    return iter(())
+
+
+def split_text(text: str) -> str:
+    """Break lines of text given to `pycran.parse` by `\\n` only"""
+    if text.count("\r") != text.count("\r\n") or any(
+        char in text for char in LINE_BREAKS
+    ):
+        return "\n".join(text.splitlines())
+
+    return text
+
+
+def is_field_name(name: str) -> bool:
+    """Check if text before a colon is a field name which needs no stripping"""
+    return (
+        bool(name) and name[0].isalpha() and name == name.strip() and "\n" not in name
+    )
+
+
+def parse_text(texts: Iterable[str], strict: bool = False) -> Iterator[Dict]:
+    """Parse pieces of text into raw field values, each piece
+    has to end with a line which is not continued in the next one.
+
+    Text is split into blocks of field lines followed by
+    their continuation lines which are kept as they are,
+    irregular blocks are parsed line by line as `pycran.parse` does.
+
+    Args:
+        texts (Iterable[str]): decoded pieces with lines broken by `\\n`
+        strict (bool): split packages on blank lines only
+
+    Returns:
+        (Iterator[Dict]): raw field values of each package
+    """
+    # well formed field names seen so far
+    names: Set[str] = set()
+    package: Dict[str, str] = {}
+    field = ""
+    # continuation lines of a field spanning several blocks
+    buffer: List[str] = []
+    for text in texts:
+        blocks = BLOCK.split(text)
+        if text.endswith("\n"):
+            # trailing line break does not start a line
+            blocks.pop()
+
+        for block in blocks:
+            name, separator, value = block.partition(":")
+            if separator and name not in names and is_field_name(name):
+                names.add(name)
+
+            if separator and name in names:
+                wrapped = value.find("\n")
+                # wrapped lines may hold blank lines ending the stanza in strict
+                # mode and lines looking like fields otherwise
+                if wrapped < 0 or not (
+                    BLANK_LINE.search(value, wrapped)
+                    if strict
+                    else value.find(":", wrapped) >= 0
+                ):
+                    if buffer:
+                        package[field] = "\n".join(buffer)
+                        buffer = []
+
+                    if name in package and not strict:
+                        yield package
+                        package = {}
+
+                    field = name
+                    package[name] = value
+                    continue
+
+            # continuation lines may look like fields or blank lines
+            for line in block.split("\n"):
+                if not line.strip():
+                    if strict and field:
+                        if buffer:
+                            package[field] = "\n".join(buffer)
+                            buffer = []
+
+                        yield package
+                        package = {}
+                        field = ""
+                    continue
+
+                name, separator, value = line.partition(":")
+                if separator and not (strict and line[:1] in (" ", "\t")):
+                    name = name.strip()
+                    if name and name[0].isalpha():
+                        if buffer:
+                            package[field] = "\n".join(buffer)
+                            buffer = []
+
+                        if name in package and not strict:
+                            yield package
+                            package = {}
+
+                        field = name
+                        package[name] = value
+                        continue
+
+                if field:
+                    if not buffer:
+                        buffer.append(package[field])
+                    buffer.append(line)
+
+    if buffer:
+        package[field] = "\n".join(buffer)
+
+    if package:
+        yield package
+
+
+def parse_lazy(
+    data: Any,
+    strict: bool = False,
+    fields: Optional[Collection[str]] = None,
+    where: Optional[Conditions] = None,
+) -> Iterator[LazyRecord]:
+    """Parse package list into records which normalize values on access,
+    only field lines are inspected while wrapped values like descriptions
+    are kept as they are until used.
+
+    Args:
+        data (Any): text, bytes like object or iterable of binary chunks
+        strict (bool): split packages on blank lines only
+        fields (Optional[Collection[str]]): fields to keep, all by default
+        where (Optional[Conditions]): conditions packages have to satisfy
+
+    Returns:
+        (Iterator[LazyRecord]): each entry from packages
+    """
+    if isinstance(data, str):
+        texts: Iterable[str] = [split_text(data)]
+    else:
+        chunks = data if isinstance(data, Iterator) else buffer_slices(data)
+        texts = decode_windows(chunks)
+
+    if observers:
+        texts = counted_texts(texts)
+
+    packages = parse_text(texts, strict)
+    if fields is not None or where:
+        packages = select(packages, fields, where, raw=True)
+
+    records = map(LazyRecord, packages)
+    return counted_records(records) if observers else records
+
+
+def parse_buffer(
+    data: Any,
+    strict: bool = False,
+    compact: bool = False,
+    lazy: bool = False,
+    fields: Optional[Collection[str]] = None,
+    where: Optional[Conditions] = None,
+) -> Iterator:
+    """Parse package list from binary buffer like memory mapped file,
+    unlike parsing lines one by one the buffer is decoded in windows.
+
+    Args:
+        data (Any): `bytes`, `memoryview` or `mmap` with UTF-8 package list
+        strict (bool): split packages on blank lines only, see `pycran.parse`
+        compact (bool): yield `PackageRecord` instead of dictionaries
+        lazy (bool): yield `LazyRecord` mappings which normalize values
+            on the first access, see `parse_lazy`
+        fields (Optional[Collection[str]]): fields to keep, all by default
+        where (Optional[Conditions]): conditions packages have to satisfy
+
+    Returns:
+        (Iterator): each entry from packages as dictionary
+    """
+    if lazy:
+        return parse_lazy(data, strict, fields, where)
+
+    return parse_records(buffer_lines(data), strict, compact, fields, where)
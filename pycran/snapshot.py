@@ -0,0 +1,304 @@
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import Mapping
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pycran.errors import IndexFormatError
+
+MAGIC = b"PYCRANSS"
+VERSION = 1
+
+# magic, version, number of records, field entries, field names and hash slots
+HEADER = struct.Struct("<8sIIIII")
+# first field entry, number of fields, package name offset and length
+RECORD = struct.Struct("<IIII")
+# field name number, value offset and length
+ENTRY = struct.Struct("<III")
+# field name offset and length
+NAME = struct.Struct("<II")
+# record number plus one, empty slots hold zero
+SLOT = struct.Struct("<I")
+
+# Offsets into the string table are 32-bit
+MAX_STRINGS_SIZE = 2**32 - 1
+
+
+def slot_count(records: int) -> int:
+    """Size of the hash table, a power of two at most half full"""
+    size = 1
+    while size < 2 * records:
+        size *= 2
+    return size
+
+
+def write_snapshot(packages: Iterable[Mapping], path: str) -> str:
+    """Serialize parsed packages into a binary snapshot which
+    `Snapshot` maps into memory without parsing anything.
+
+    Strings are deduplicated into a single UTF-8 string table,
+    records keep offsets of their field names and values into it
+    and package names are indexed by an open addressing hash table.
+
+    Args:
+        packages (Iterable[Mapping]): parsed package metadata
+        path (str): where to write the snapshot, the file
+            is replaced once the snapshot is complete
+
+    Returns:
+        (str): path to the written snapshot
+    """
+    strings: Dict[str, Tuple[int, int]] = {}
+    table: List[bytes] = []
+    size = 0
+
+    def store(value: str) -> Tuple[int, int]:
+        nonlocal size
+        span = strings.get(value)
+        if span is None:
+            data = value.encode("utf-8")
+            span = strings[value] = size, len(data)
+            table.append(data)
+            size += len(data)
+            if size > MAX_STRINGS_SIZE:
+                raise ValueError("Snapshot string table exceeds 4 GiB.")
+        return span
+
+    names: Dict[str, int] = {}
+    records: List[bytes] = []
+    entries: List[bytes] = []
+    hashes: List[Tuple[int, int]] = []
+    for package in packages:
+        name_offset, name_length = 0, 0
+        name = package.get("Package")
+        if name:
+            name_offset, name_length = store(name)
+            hashes.append((zlib.crc32(name.encode("utf-8")), len(records)))
+
+        records.append(
+            RECORD.pack(len(entries), len(package), name_offset, name_length)
+        )
+        for field, value in package.items():
+            number = names.get(field)
+            if number is None:
+                number = names[field] = len(names)
+            entries.append(ENTRY.pack(number, *store(value)))
+
+    slots = [0] * slot_count(len(hashes))
+    mask = len(slots) - 1
+    # records are inserted in order so lookups find the first one
+    for checksum, number in hashes:
+        position = checksum & mask
+        while slots[position]:
+            position = (position + 1) & mask
+        slots[position] = number + 1
+
+    name_table = [NAME.pack(*store(field)) for field in names]
+    # concurrent writers use their own files and never leave partial ones
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as fp:
+            fp.write(
+                HEADER.pack(
+                    MAGIC, VERSION, len(records), len(entries), len(names), len(slots)
+                )
+            )
+            fp.write(b"".join(records))
+            fp.write(b"".join(entries))
+            fp.write(b"".join(name_table))
+            fp.write(b"".join(SLOT.pack(slot) for slot in slots))
+            fp.write(b"".join(table))
+
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+
+    return path
+
+
+class SnapshotRecord(Mapping):
+    """Read-only package record reading fields from the mapped snapshot,
+    values are decoded on every access and nothing is cached.
+    """
+
+    __slots__ = ("_snapshot", "_first", "_count")
+
+    def __init__(self, snapshot: "Snapshot", first: int, count: int):
+        self._snapshot = snapshot
+        self._first = first
+        self._count = count
+
+    def _entries(self) -> Iterator[Tuple[int, int, int]]:
+        start = self._snapshot._entries_offset + self._first * ENTRY.size
+        end = start + self._count * ENTRY.size
+        return ENTRY.iter_unpack(self._snapshot._data[start:end])
+
+    def __getitem__(self, field: str) -> str:
+        snapshot = self._snapshot
+        number = snapshot._field_numbers.get(field)
+        if number is not None:
+            for found, offset, length in self._entries():
+                if found == number:
+                    return snapshot._string(offset, length)
+
+        raise KeyError(field)
+
+    def __iter__(self) -> Iterator[str]:
+        names = self._snapshot._field_names
+        for number, _offset, _length in self._entries():
+            yield names[number]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _items(self) -> List[Tuple[str, str]]:
+        snapshot = self._snapshot
+        names = snapshot._field_names
+        return [
+            (names[number], snapshot._string(offset, length))
+            for number, offset, length in self._entries()
+        ]
+
+    def __reduce__(self):
+        # mapped data can not be shared so the copy is a plain dictionary
+        return dict, (dict(self._items()),)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self._items())!r})"
+
+
+def _map(path: str) -> Tuple[BinaryIO, Any]:
+    fp = open(path, "rb")
+    if os.fstat(fp.fileno()).st_size < HEADER.size:
+        fp.close()
+        raise IndexFormatError(f"File {path} is not a package snapshot.")
+
+    return fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class Snapshot:
+    """Packages of a snapshot written by `write_snapshot`
+
+    The file is memory mapped read-only so processes opening
+    the same snapshot share its pages, opening it reads only
+    the header and field names and records read their fields
+    straight from the mapped data when accessed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file, self._data = _map(path)
+        magic, version, self.size, entries, names, self._slots = HEADER.unpack_from(
+            self._data
+        )
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise IndexFormatError(f"File {path} is not a package snapshot.")
+
+        self._records_offset = HEADER.size
+        self._entries_offset = self._records_offset + self.size * RECORD.size
+        names_offset = self._entries_offset + entries * ENTRY.size
+        self._slots_offset = names_offset + names * NAME.size
+        self._strings_offset = self._slots_offset + self._slots * SLOT.size
+
+        self._field_names = [
+            self._string(offset, length)
+            for offset, length in NAME.iter_unpack(
+                self._data[names_offset : self._slots_offset]
+            )
+        ]
+        self._field_numbers = {
+            name: number for number, name in enumerate(self._field_names)
+        }
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._strings_offset + offset
+        return str(self._data[start : start + length], "utf-8")
+
+    def _record(self, number: int) -> Tuple[int, int, int, int]:
+        return RECORD.unpack_from(
+            self._data, self._records_offset + number * RECORD.size
+        )
+
+    def __getitem__(self, number: int) -> SnapshotRecord:
+        if number < 0:
+            number += self.size
+        if not 0 <= number < self.size:
+            raise IndexError("snapshot record index out of range")
+
+        first, count, _offset, _length = self._record(number)
+        return SnapshotRecord(self, first, count)
+
+    def __iter__(self) -> Iterator[SnapshotRecord]:
+        for first, count, _offset, _length in RECORD.iter_unpack(
+            self._data[self._records_offset : self._entries_offset]
+        ):
+            yield SnapshotRecord(self, first, count)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def numbers(self, name: str) -> Iterator[int]:
+        """Record numbers of the package in snapshot order"""
+        if not self._slots:
+            return
+
+        key = name.encode("utf-8")
+        mask = self._slots - 1
+        position = zlib.crc32(key) & mask
+        # duplicates were inserted in order so they are probed in order
+        while True:
+            (slot,) = SLOT.unpack_from(
+                self._data, self._slots_offset + position * SLOT.size
+            )
+            if not slot:
+                return
+
+            _first, _count, offset, length = self._record(slot - 1)
+            start = self._strings_offset + offset
+            if length == len(key) and self._data[start : start + length] == key:
+                yield slot - 1
+            position = (position + 1) & mask
+
+    def lookup(self, name: str) -> Optional[SnapshotRecord]:
+        """Find package by name
+        Args:
+            name (str): package name
+
+        Returns:
+            (Optional[SnapshotRecord]): the first record of the package
+                or `None` if not found
+        """
+        for number in self.numbers(name):
+            return self[number]
+
+        return None
+
+    def lookup_all(self, name: str) -> List[SnapshotRecord]:
+        """Find every record of the package, package lists
+        may have the same package listed more than once.
+        """
+        return [self[number] for number in self.numbers(name)]
+
+    def names(self) -> Iterator[str]:
+        """Iterate over package names in snapshot order"""
+        for _first, _count, offset, length in RECORD.iter_unpack(
+            self._data[self._records_offset : self._entries_offset]
+        ):
+            if length:
+                yield self._string(offset, length)
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and self.lookup(name) is not None
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
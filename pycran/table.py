@@ -0,0 +1,286 @@
+import re
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, compress, islice
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Pattern,
+    Set,
+    Union,
+)
+
+# Above this many values `isin` compares sliced values instead of searching
+# the buffer for every value
+SEARCH_LIMIT = 16
+
+
+class Mask(bytes):
+    """Row selection with a single `0` or `1` byte per row
+
+    Masks are combined with `&`, `|` and `~`, the operations
+    run over the whole mask at once using integer arithmetic.
+    """
+
+    def _combine(self, value: int) -> "Mask":
+        return Mask(value.to_bytes(len(self), "little"))
+
+    def __and__(self, other: bytes) -> "Mask":  # type: ignore
+        return self._combine(_as_int(self) & _as_int(other))
+
+    def __or__(self, other: bytes) -> "Mask":  # type: ignore
+        return self._combine(_as_int(self) | _as_int(other))
+
+    def __invert__(self) -> "Mask":
+        return self._combine(_as_int(self) ^ _as_int(b"\x01" * len(self)))
+
+    def count(self, *args: Any) -> int:  # type: ignore
+        """Count selected rows if called without arguments"""
+        return super().count(*args) if args else super().count(1)
+
+
+def _as_int(mask: bytes) -> int:
+    return int.from_bytes(mask, "little")
+
+
+class Column:
+    """Values of a single field stored as one concatenated
+    string with offsets of every value and presence mask.
+    """
+
+    __slots__ = ("buffer", "offsets", "present")
+
+    def __init__(self, values: List[Optional[str]]):
+        strings = [value or "" for value in values]
+        self.buffer: str = "".join(strings)
+        self.offsets: array = array("q", [0])
+        self.offsets.extend(accumulate(map(len, strings)))
+        self.present: Mask = Mask(value is not None for value in values)
+
+    def __len__(self) -> int:
+        return len(self.present)
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        if not self.present[row]:
+            return None
+
+        return self.buffer[self.offsets[row] : self.offsets[row + 1]]
+
+    def values(self) -> List[Optional[str]]:
+        """Materialize column values, `None` marks missing values"""
+        buffer = self.buffer
+        ends = islice(self.offsets, 1, None)
+        return [
+            buffer[start:end] if present else None
+            for start, end, present in zip(self.offsets, ends, self.present)
+        ]
+
+    def equal(self, value: str, selected: bytearray) -> None:
+        """Mark rows equal to value by searching the buffer,
+        only offsets of occurrences are compared and no values are sliced.
+        """
+        buffer, offsets, present = self.buffer, self.offsets, self.present
+        size = len(value)
+        if not size:
+            for row in range(len(present)):
+                if present[row] and offsets[row] == offsets[row + 1]:
+                    selected[row] = 1
+            return
+
+        row = 0
+        position = buffer.find(value)
+        while position >= 0:
+            # the last row starting at or before the occurrence
+            row = bisect_right(offsets, position, row) - 1
+            end = position + size
+            if offsets[row] == position and offsets[row + 1] == end and present[row]:
+                selected[row] = 1
+                position = buffer.find(value, end)
+            else:
+                position = buffer.find(value, position + 1)
+
+    def contained(self, options: Set[str], selected: bytearray) -> None:
+        """Mark rows whose value is one of options, only values
+        having the length of one of them are sliced.
+        """
+        buffer, offsets, present = self.buffer, self.offsets, self.present
+        lengths = {len(value) for value in options}
+        start = 0
+        for row, end in enumerate(islice(offsets, 1, None)):
+            if end - start in lengths and present[row] and buffer[start:end] in options:
+                selected[row] = 1
+            start = end
+
+    def take(self, rows: List[int]) -> "Column":
+        """Build a new column from given row numbers"""
+        buffer, offsets, present = self.buffer, self.offsets, self.present
+        return Column(
+            [
+                buffer[offsets[row] : offsets[row + 1]] if present[row] else None
+                for row in rows
+            ]
+        )
+
+
+class PackageTable:
+    """Columnar index of packages built from `pycran.parse` results
+
+    Each field is stored as a `Column`, filters produce
+    a `Mask` which is applied to the table via `filter`.
+    """
+
+    def __init__(self, columns: Dict[str, Column], size: int):
+        self.columns = columns
+        self.size = size
+
+    @classmethod
+    def from_packages(cls, packages: Iterable[Mapping]) -> "PackageTable":
+        """Build table from parsed packages
+        Args:
+            packages (Iterable[Mapping]): parsed packages
+
+        Returns:
+            (PackageTable): columnar table of packages
+        """
+        values: Dict[str, List[Optional[str]]] = {}
+        size = 0
+        for package in packages:
+            for field, value in package.items():
+                column = values.get(field)
+                if column is None:
+                    column = values[field] = [None] * size
+                column.append(value)
+
+            size += 1
+            for column in values.values():
+                if len(column) < size:
+                    column.append(None)
+
+        columns = {field: Column(column) for field, column in values.items()}
+        return cls(columns, size)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[Dict]:
+        columns = {field: column.values() for field, column in self.columns.items()}
+        for row in range(self.size):
+            yield {
+                field: values[row]
+                for field, values in columns.items()
+                if values[row] is not None
+            }
+
+    def __getitem__(self, row: int) -> Dict[str, str]:
+        package = {}
+        for field, column in self.columns.items():
+            value = column[row]
+            if value is not None:
+                package[field] = value
+
+        return package
+
+    @property
+    def fields(self) -> List[str]:
+        return list(self.columns)
+
+    def column(self, field: str) -> List[Optional[str]]:
+        """Values of the field, `None` marks missing values"""
+        if field not in self.columns:
+            return [None] * self.size
+
+        return self.columns[field].values()
+
+    def present(self, field: str) -> Mask:
+        """Select rows having the field"""
+        if field not in self.columns:
+            return Mask(self.size)
+
+        return self.columns[field].present
+
+    def eq(self, field: str, value: str) -> Mask:
+        """Select rows where field equals to value, the column buffer
+        is searched for the value so no values are materialized.
+        """
+        selected = bytearray(self.size)
+        if field in self.columns:
+            self.columns[field].equal(value, selected)
+        return Mask(selected)
+
+    def isin(self, field: str, values: Iterable[str]) -> Mask:
+        """Select rows where field value is one of values, a few values
+        are searched like in `eq` and otherwise only values having
+        the length of one of them are sliced from the column buffer.
+        """
+        options = set(values)
+        selected = bytearray(self.size)
+        column = self.columns.get(field)
+        if column is not None and len(options) <= SEARCH_LIMIT:
+            for value in options:
+                column.equal(value, selected)
+        elif column is not None:
+            column.contained(options, selected)
+        return Mask(selected)
+
+    def match(self, field: str, pattern: Union[str, Pattern]) -> Mask:
+        """Select rows where field value matches regular expression,
+        values are sliced from the column buffer one at a time
+        as anchors have to match at their boundaries.
+        """
+        search = re.compile(pattern).search
+        selected = bytearray(self.size)
+        column = self.columns.get(field)
+        if column is not None:
+            buffer, offsets, present = column.buffer, column.offsets, column.present
+            start = 0
+            for row, end in enumerate(islice(offsets, 1, None)):
+                if present[row] and search(buffer[start:end]) is not None:
+                    selected[row] = 1
+                start = end
+        return Mask(selected)
+
+    def filter(self, mask: bytes) -> "PackageTable":
+        """Build a new table with rows selected by mask"""
+        rows = list(compress(range(self.size), mask))
+        columns = {field: column.take(rows) for field, column in self.columns.items()}
+        return PackageTable(columns, len(rows))
+
+    def select(self, *fields: str) -> "PackageTable":
+        """Build a new table with only given fields"""
+        columns = {
+            field: self.columns[field] for field in fields if field in self.columns
+        }
+        return PackageTable(columns, self.size)
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """Export columns as NumPy object arrays, missing values are `None`"""
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("NumPy is required, run `pip install numpy`") from None
+
+        return {
+            field: numpy.array(column.values(), dtype=object)
+            for field, column in self.columns.items()
+        }
+
+    def to_arrow(self) -> Any:
+        """Export table as `pyarrow.Table` with string columns"""
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError(
+                "PyArrow is required, run `pip install pyarrow`"
+            ) from None
+
+        return pyarrow.table(
+            {
+                field: pyarrow.array(column.values(), type=pyarrow.string())
+                for field, column in self.columns.items()
+            }
+        )
@@ -1,5 +1,9 @@
 import tarfile
-from typing import Union
+from typing import IO, Callable, Collection, Iterable, Mapping, Union
 
 PathOrTarFile = Union[tarfile.TarFile, str]
 BytesOrString = Union[bytes, str]
+StreamOrChunks = Union[IO, Iterable[BytesOrString]]
+# Accepted value, collection of accepted values or a test of the value
+Condition = Union[str, Collection[str], Callable[[str], bool]]
+Conditions = Mapping[str, Condition]
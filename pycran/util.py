@@ -1,8 +1,30 @@
+import codecs
+import re
 import tarfile
 from os import path
+from typing import Any, Generator, List
 
 from pycran.errors import DescriptionNotFound, NotTarFile
-from pycran.typings import BytesOrString, PathOrTarFile
+from pycran.metrics import (
+    BYTES_READ,
+    DECODE,
+    FIND_DESCRIPTION,
+    READ_DESCRIPTION,
+    count,
+    observers,
+    timer,
+)
+from pycran.typings import BytesOrString, PathOrTarFile, StreamOrChunks
+
+CHUNK_SIZE = 64 * 1024
+
+NEWLINE = re.compile(r"\r\n|\r|\n")
+
+# Field declaring the charset of a stanza like `latin1`
+ENCODING = re.compile(rb"(?:^|\n)Encoding[ \t]*:[ \t]*([^\s]+)")
+
+# Blank line ending a stanza
+BLANK_LINE = re.compile(rb"\n[ \t]*(?:\r?\n|\r)")
 
 
 def as_string(meta_line: BytesOrString) -> str:
@@ -18,29 +40,270 @@ def as_string(meta_line: BytesOrString) -> str:
     return meta_line
 
 
-def read_description(archive: PathOrTarFile) -> str:
-    """Convert bytes to string
+def decode_text(data: Any) -> str:
+    """Decode metadata at once, stanzas which are not valid UTF-8
+    are decoded with the codec named by their `Encoding` field
+    like `latin1` as R packages declare it.
+
+    Args:
+        data (Any): `bytes`, `memoryview` or `mmap` with metadata
+
+    Returns:
+        (str): decoded text
+    """
+    try:
+        return str(data, "utf-8")
+    except UnicodeDecodeError as e:
+        position = e.start
+
+    parts = []
+    start = 0
+    while True:
+        # decode valid stanzas at once and the broken one with its codec
+        begin = start
+        for match in BLANK_LINE.finditer(data, start, position):
+            begin = match.end()
+        blank = BLANK_LINE.search(data, position)
+        end = blank.end() if blank else len(data)
+
+        parts.append(str(data[start:begin], "utf-8"))
+        stanza = data[begin:end]
+        parts.append(str(stanza, stanza_codec(stanza)))
+        start = end
+        try:
+            parts.append(str(data[start:], "utf-8"))
+            return "".join(parts)
+        except UnicodeDecodeError as e:
+            position = start + e.start
+
+
+def stanza_codec(stanza: Any) -> str:
+    """Find codec of the stanza by its `Encoding` field
+    Args:
+        stanza (Any): bytes like stanza
+
+    Returns:
+        (str): Python codec name, UTF-8 if the encoding is not known
+    """
+    match = ENCODING.search(stanza)
+    if match is None:
+        return "utf-8"
+
+    try:
+        return codecs.lookup(str(match.group(1), "ascii")).name
+    except (LookupError, UnicodeDecodeError):
+        return "utf-8"
+
+
+def split_lines(text: str) -> List[str]:
+    """Split text into lines in the same way as `bytes.splitlines` does
+    Args:
+        text (str): decoded text
+
+    Returns:
+        (List[str]): lines broken by `\\r\\n`, `\\r` or `\\n` only
+    """
+    lines = text.splitlines()
+
+    # `str.splitlines` also breaks lines on characters like `\x0c` or `\x85`,
+    # every such character adds a line so the number of lines reveals them
+    breaks = text.count("\n") + text.count("\r") - text.count("\r\n")
+    last = text[-1:]
+    if last and last not in "\r\n":
+        if last.isspace():
+            breaks = -1
+        else:
+            breaks += 1
+
+    if len(lines) == breaks:
+        return lines
+
+    lines = NEWLINE.split(text)
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def iter_chunks(source: StreamOrChunks, chunk_size: int = CHUNK_SIZE) -> Generator:
+    """Read chunks from file object or iterable of chunks
+    Args:
+        source (StreamOrChunks): binary or text file object or iterable of chunks
+        chunk_size (int): amount of data to read from file objects at once
+
+    Returns:
+        (Generator): chunks of `bytes` or `str`
+    """
+    if hasattr(source, "read"):
+        size = 0
+        try:
+            while True:
+                chunk = source.read(chunk_size)  # type: ignore
+                if not chunk:
+                    return
+                size += len(chunk)
+                yield chunk
+        finally:
+            if observers:
+                count(BYTES_READ, size)
+    else:
+        yield from source  # type: ignore
+
+
+def normalize(value: str) -> str:
+    """Strip value lines and join them with spaces skipping blank ones
+    Args:
+        value (str): raw value with its continuation lines
+
+    Returns:
+        (str): value as `pycran.parse` returns it
+    """
+    newline = value.find("\n")
+    if (newline < 0 or newline == len(value) - 1) and "\r" not in value:
+        return value.strip()
+
+    first, *rest = NEWLINE.split(value)
+    lines = [first.strip()]
+    for line in rest:
+        line = line.strip()
+        if line:
+            lines.append(line)
+
+    return " ".join(lines)
+
+
+class LineSplitter:
+    """Split chunks of data into lines as they arrive,
+    lines split across chunk boundaries are carried over
+    so at most one partial line is kept in memory.
+    """
+
+    def __init__(self) -> None:
+        # pieces of the partial line, joined once the line is complete
+        # so long lines arriving in small chunks are copied only once
+        self.pieces: List[BytesOrString] = []
+
+    def feed(self, chunk: BytesOrString) -> List[str]:
+        """Split next chunk
+        Args:
+            chunk (BytesOrString): raw data
+
+        Returns:
+            (List[str]): complete lines with line endings kept
+        """
+        lines = chunk.splitlines(True)
+        if self.pieces:
+            # a trailing carriage return is complete unless `\n` follows
+            last = self.pieces[-1]
+            if (
+                len(lines) == 1
+                and is_partial_line(chunk)
+                and last[-1:] not in ("\r", b"\r")
+            ):
+                self.pieces.append(chunk)
+                return []
+
+            self.pieces.append(chunk)
+            lines = chunk[:0].join(self.pieces).splitlines(True)  # type: ignore
+            self.pieces = []
+
+        if lines and is_partial_line(lines[-1]):
+            self.pieces.append(lines.pop())
+
+        with timer(DECODE):
+            return [as_string(line) for line in lines]
+
+    def close(self) -> List[str]:
+        """Return the last line if any"""
+        pieces, self.pieces = self.pieces, []
+        return [as_string(pieces[0][:0].join(pieces))] if pieces else []  # type: ignore
+
+
+def iter_lines(source: StreamOrChunks, chunk_size: int = CHUNK_SIZE) -> Generator:
+    """Split a stream of chunks into decoded lines
+    Args:
+        source (StreamOrChunks): binary or text file object or iterable of chunks
+        chunk_size (int): amount of data to read from file objects at once
+
+    Returns:
+        (Generator): lines as strings with line endings kept
+    """
+    splitter = LineSplitter()
+    for chunk in iter_chunks(source, chunk_size):
+        yield from splitter.feed(chunk)
+
+    yield from splitter.close()
+
+
+def is_partial_line(line: BytesOrString) -> bool:
+    """Check if line may continue in the next chunk
+    Note: a trailing carriage return may be followed by a line feed.
+    Args:
+        line (BytesOrString): last line of a chunk
+
+    Returns:
+        (bool): `True` if line has no complete line terminator
+    """
+    return len(line.splitlines()[0]) == len(line) or line[-1:] in ("\r", b"\r")
+
+
+def read_description(archive: PathOrTarFile) -> bytes:
+    """Read description file from the archive
+    Note: archive members are read lazily and reading stops
+          at the description file so the rest is never decompressed.
     Args:
         archive (PathOrTarFile): path to archive or `TarFile` instance
 
     Returns:
-        (str): contents of description file
+        (bytes): contents of description file
     """
     if isinstance(archive, str):
         if not path.exists(archive):
             raise FileNotFoundError(f"File {archive} does not exist.")
 
-        if not tarfile.is_tarfile(archive):
-            raise NotTarFile(f"File {archive} is not a tar archive.")
-
-        tar: tarfile.TarFile = tarfile.open(archive)
+        try:
+            tar: tarfile.TarFile = tarfile.open(archive)
+        except tarfile.ReadError:
+            raise NotTarFile(f"File {archive} is not a tar archive.") from None
     else:
         tar = archive
 
     with tar:
-        description: tarfile.TarInfo = tar.getmember(get_description_path(tar))
-        with tar.fileobject(tar, description) as metadata:  # type: ignore
-            return metadata.read()
+        info = find_description(tar)
+        with timer(READ_DESCRIPTION):
+            with tar.extractfile(info) as metadata:  # type: ignore
+                data = metadata.read()
+
+    if observers:
+        count(BYTES_READ, len(data))
+    return data
+
+
+def is_description(name: str) -> bool:
+    """Check if archive member is the package description file
+    Args:
+        name (str): archive member name like `A3/DESCRIPTION`
+
+    Returns:
+        (bool): `True` for top-level `DESCRIPTION` of the package
+    """
+    parts = [part for part in name.split("/") if part not in ("", ".")]
+    return len(parts) <= 2 and parts[-1:] == ["DESCRIPTION"]
+
+
+def find_description(tar: tarfile.TarFile) -> tarfile.TarInfo:
+    """Lookup description file iterating over archive members lazily
+    Args:
+        tar (tarfile.TarFile): `tarfile.TarFile` instance
+
+    Returns:
+        (tarfile.TarInfo): description file member
+    """
+    with timer(FIND_DESCRIPTION):
+        for info in tar:
+            if info.isfile() and is_description(info.name):
+                return info
+
+    raise DescriptionNotFound("Description file not found.")
 
 
 def get_description_path(tar: tarfile.TarFile) -> str:
@@ -51,8 +314,4 @@ def get_description_path(tar: tarfile.TarFile) -> str:
     Returns:
         (str): path to description file
     """
-    for info in tar.getmembers():
-        if "DESCRIPTION" in info.name:
-            return info.name
-
-    raise DescriptionNotFound("Description file not found.")
+    return find_description(tar).name
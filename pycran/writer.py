@@ -0,0 +1,224 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import IO, Any, Iterable, List, Mapping, Optional, Sequence, Union
+
+from pycran.compression import BZIP2, GZIP, XZ
+
+# CRAN wraps values with R `strwrap` so lines are shorter than 72 characters
+WIDTH = 72
+INDENT = " " * 8
+
+BATCH_SIZE = 512
+
+SUFFIXES = {GZIP: ".gz", BZIP2: ".bz2", XZ: ".xz"}
+
+
+def wrap(line: str, width: int = WIDTH) -> str:
+    """Wrap field line on whitespace in the same way as CRAN does,
+    words longer than the line are never broken.
+
+    Args:
+        line (str): field line like `Imports: pkg, ...`
+        width (int): lines are kept shorter than this
+
+    Returns:
+        (str): line followed by indented continuation lines
+    """
+    words = line.split()
+    lines = []
+    current = words[0]
+    for word in words[1:]:
+        if len(current) + len(word) + 1 < width:
+            current = f"{current} {word}"
+        else:
+            lines.append(current)
+            current = INDENT + word
+
+    lines.append(current)
+    return "\n".join(lines)
+
+
+def encode_record(record: Mapping, width: int = WIDTH) -> str:
+    """Dump a single record wrapping long values
+    Args:
+        record (Mapping): package metadata
+        width (int): lines are kept shorter than this if possible
+
+    Returns:
+        (str): record without the trailing line break
+    """
+    lines = []
+    for key, value in record.items():
+        value = str(value)
+        line = f"{key}: {value}"
+        if len(line) >= width or "\n" in value:
+            line = wrap(line, width)
+        lines.append(line)
+
+    return "\n".join(lines)
+
+
+def is_text(output: Any) -> bool:
+    """Check if file object takes `str` rather than bytes,
+    objects like `tempfile.SpooledTemporaryFile` which are neither
+    text nor binary streams are told by their mode or a trial write.
+    """
+    if isinstance(output, io.TextIOBase):
+        return True
+
+    if isinstance(output, (io.RawIOBase, io.BufferedIOBase)):
+        return False
+
+    # compressed streams have numeric modes so only strings are trusted
+    mode = getattr(output, "mode", None)
+    if isinstance(mode, str):
+        return "b" not in mode
+
+    try:
+        output.write("")
+    except TypeError:
+        return False
+
+    return True
+
+
+def encode_many(
+    records: Iterable[Mapping],
+    fileobj: Union[IO, Sequence[IO]],
+    width: int = WIDTH,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """Write records to file objects as a package list like CRAN `PACKAGES`,
+    records are separated by blank lines and written in batches
+    so memory use does not depend on the number of records.
+
+    Args:
+        records (Iterable[Mapping]): package metadata
+        fileobj (Union[IO, Sequence[IO]]): text or binary file object
+            or a list of them, binary ones get UTF-8 encoded data and
+            may be compressed streams like `gzip.GzipFile`
+        width (int): long values are wrapped to keep lines shorter
+        batch_size (int): number of records written at once
+
+    Returns:
+        (int): number of written records
+    """
+    outputs: List[Any] = (
+        list(fileobj) if isinstance(fileobj, (list, tuple)) else [fileobj]
+    )
+    texts = [output for output in outputs if is_text(output)]
+    binaries = [output for output in outputs if output not in texts]
+
+    with ExitStack() as stack:
+        executor = None
+        if len(binaries) > 1:
+            executor = stack.enter_context(ThreadPoolExecutor(len(binaries)))
+
+        return write_batches(records, texts, binaries, executor, width, batch_size)
+
+
+def write_batches(
+    records: Iterable[Mapping],
+    texts: List[Any],
+    binaries: List[Any],
+    executor: Optional[ThreadPoolExecutor],
+    width: int,
+    batch_size: int,
+) -> int:
+    count = 0
+    batch: List[str] = []
+    iterator = iter(records)
+    while True:
+        for record in iterator:
+            batch.append(encode_record(record, width))
+            if len(batch) >= batch_size:
+                break
+
+        if not batch:
+            return count
+
+        # blank line separates this batch from the previous one
+        chunk = ("\n" if count else "") + "\n\n".join(batch) + "\n"
+        count += len(batch)
+        batch = []
+        for output in texts:
+            output.write(chunk)
+
+        if binaries:
+            data = chunk.encode("utf-8")
+            if executor is None:
+                for output in binaries:
+                    output.write(data)
+            else:
+                # compressors release the GIL so outputs are written in parallel
+                for future in [executor.submit(o.write, data) for o in binaries]:
+                    future.result()
+
+
+def open_compressed(fp: IO, compression: Optional[str]) -> IO:
+    """Wrap binary file object with a compressor"""
+    if compression == GZIP:
+        return gzip.GzipFile(filename="", mode="wb", fileobj=fp, compresslevel=6)  # type: ignore
+
+    if compression == XZ:
+        return lzma.LZMAFile(fp, "wb")  # type: ignore
+
+    if compression == BZIP2:
+        return bz2.BZ2File(fp, "wb")  # type: ignore
+
+    return fp
+
+
+def write_packages(
+    records: Iterable[Mapping],
+    directory: str = ".",
+    compressions: Sequence[Optional[str]] = (None, GZIP, XZ),
+    width: int = WIDTH,
+    batch_size: int = BATCH_SIZE,
+) -> List[str]:
+    """Write `PACKAGES` and its compressed variants in a single pass,
+    files are written next to their destination and replace
+    existing ones only once all the records are written.
+
+    Args:
+        records (Iterable[Mapping]): package metadata
+        directory (str): where to put package lists
+        compressions (Sequence[Optional[str]]): `None` for plain `PACKAGES`,
+            `gzip`, `xz` or `bz2` for `PACKAGES.gz` and the like
+        width (int): long values are wrapped to keep lines shorter
+        batch_size (int): number of records written at once
+
+    Returns:
+        (List[str]): paths to written files
+    """
+    for compression in compressions:
+        if compression is not None and compression not in SUFFIXES:
+            raise ValueError(f"Unknown compression format {compression}.")
+
+    paths = [
+        os.path.join(directory, "PACKAGES" + SUFFIXES.get(compression or "", ""))
+        for compression in compressions
+    ]
+    try:
+        with ExitStack() as stack:
+            outputs = []
+            for path, compression in zip(paths, compressions):
+                fp = stack.enter_context(open(f"{path}.tmp", "wb"))
+                outputs.append(stack.enter_context(open_compressed(fp, compression)))
+
+            encode_many(records, outputs, width, batch_size)
+
+        for path in paths:
+            os.replace(f"{path}.tmp", path)
+    except BaseException:
+        for path in paths:
+            if os.path.exists(f"{path}.tmp"):
+                os.unlink(f"{path}.tmp")
+        raise
+
+    return paths
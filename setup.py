@@ -0,0 +1,55 @@
+"""Build the package together with optional compiled parsers,
+without a compiler the pure Python parsers are used.
+
+    pip install .                         # install with speedups if possible
+    python setup.py build_ext --inplace   # for development
+"""
+import re
+
+from setuptools import Extension, setup
+
+with open("pycran/__init__.py") as fp:
+    version = re.search(r'__version__ = "(.+)"', fp.read()).group(1)  # type: ignore
+
+with open("README.md") as fp:
+    long_description = fp.read()
+
+setup(
+    name="pycran",
+    version=version,
+    author="Sultan Iman",
+    author_email="sultan.imanhodjaev@gmail.com",
+    url="https://github.com/imanhodjaev/pycran",
+    description="Parse CRAN package metadata",
+    long_description=long_description,
+    long_description_content_type="text/markdown",
+    keywords="CRAN,R,metadata,parse,yamp",
+    license="Apache-2.0",
+    packages=["pycran"],
+    python_requires=">=3.6",
+    install_requires=[],
+    extras_require={
+        "table": ["numpy", "pyarrow"],
+        "test": ["pytest", "pytest-cov", "python-debian", "deb-pkg-tools>=7.0"],
+        "dev": ["bumpversion", "black==19.10b0", "isort", "mypy"],
+    },
+    classifiers=[
+        "License :: OSI Approved :: Apache Software License",
+        "Development Status :: 5 - Production/Stable",
+        "Programming Language :: Python :: 3 :: Only",
+        "Programming Language :: Python :: 3.6",
+        "Programming Language :: Python :: 3.7",
+        "Programming Language :: Python :: 3.8",
+        "Operating System :: OS Independent",
+        "Intended Audience :: Developers",
+        "Natural Language :: English",
+        "Topic :: Software Development :: Libraries :: Python Modules",
+        "Topic :: Software Development :: Libraries",
+        "Topic :: Software Development",
+        "Typing :: Typed",
+    ],
+    # fall back to pure Python parsers if there is no compiler
+    ext_modules=[
+        Extension("pycran._speedups", ["pycran/_speedups.c"], optional=True)
+    ],
+)
@@ -1,7 +1,16 @@
+import asyncio
+import bz2
+import gzip
+import lzma
+import mmap
+import pickle
+import random
 import re
+import shutil
 import tarfile
+import tempfile
 import textwrap
-from io import StringIO
+from io import BytesIO, StringIO
 from os import path
 from zipfile import ZipFile
 
@@ -9,7 +18,39 @@ import pytest
 from debian.deb822 import Deb822
 
 import pycran
-from pycran.errors import DescriptionNotFound, NotTarFile
+import pycran.cache
+from pycran.aio import fetch, fetch_many, http_transport, parse_async
+from pycran.bulk import decode_many, from_files, scan_directory
+from pycran.cache import MetadataCache, file_md5
+from pycran.compression import (
+    MAGIC_SIZE,
+    compress_blocks,
+    decompress,
+    detect_compression,
+)
+from pycran.depends import (
+    Dependency,
+    check_dependencies,
+    compare_versions,
+    parse_dependencies,
+)
+from pycran.errors import (
+    DependencyCycle,
+    DescriptionNotFound,
+    FetchError,
+    IndexFormatError,
+    NotTarFile,
+)
+from pycran.graph import SUGGESTS, DependencyGraph
+from pycran.incremental import diff, fingerprint
+from pycran.index import PackageIndex
+from pycran.metrics import Metrics, Observer, observe, observers
+from pycran.parallel import shard_spans
+from pycran.parser import parse_lines, parse_records, parse_stanzas, speedups
+from pycran.records import LazyRecord, PackageRecord
+from pycran.scanner import decode_windows, parse_buffer, parse_text
+from pycran.snapshot import Snapshot, SnapshotRecord, write_snapshot
+from pycran.util import LineSplitter
 
 data_path = path.join(path.dirname(__file__), "data")
 
@@ -195,6 +236,12 @@ def test_parse_properly_parses_non_field_lines():
     assert "<http://ocrsdk.com/>" in package["Description"]
 
 
+def test_parse_joins_long_continuation_blocks():
+    data = "Package: abc\nDescription: start\n" + "    more text\n" * 5000
+    [package] = list(pycran.parse(data))
+    assert package["Description"] == "start" + " more text" * 5000
+
+
 def test_parse_works_with_binary_data():
     data = b"""
     Package: ABACUS
@@ -258,6 +305,709 @@ def test_parse_can_parse_mixed_entries_from_cran_registry():
         ]
 
 
+@pytest.mark.parametrize("lazy", [False, True])
+def test_parse_strict_splits_on_blank_lines(lazy):
+    data = textwrap.dedent("""
+        Package: abc
+        Version: 2.1
+
+        Package: abc.data
+        Description: Tools for X.
+            Note: requires Y.
+        Depends: R (>= 2.10)
+        """)
+    expected = [
+        {"Package": "abc", "Version": "2.1"},
+        {
+            "Package": "abc.data",
+            "Description": "Tools for X. Note: requires Y.",
+            "Depends": "R (>= 2.10)",
+        },
+    ]
+    # indented lines continue the field even if they look like fields
+    for source in (data, data.encode()):
+        assert list(pycran.parse(source, strict=True, lazy=lazy)) == expected
+        assert list(pycran.parse(source, strict=True, fields=["Note"])) == [{}, {}]
+
+    # heuristic mode merges stanzas if no field repeats
+    assert list(pycran.parse("Package: abc\n\nVersion: 2.1")) == [
+        {"Package": "abc", "Version": "2.1"}
+    ]
+    assert len(list(pycran.parse("Package: abc\n\nVersion: 2.1", strict=True))) == 2
+
+
+def test_parse_strict_matches_default_mode_on_cran_registry():
+    with ZipFile(path.join(data_path, "PACKAGES.txt.zip")) as archive:
+        with archive.open("PACKAGES.txt") as fp:
+            data = fp.read()
+
+    assert list(pycran.parse(data, strict=True)) == list(pycran.parse(data))
+
+
+def test_parse_compact_records_behave_like_dictionaries():
+    with ZipFile(path.join(data_path, "PACKAGES.txt.zip")) as archive:
+        with archive.open("PACKAGES.txt") as fp:
+            data = fp.read()
+
+    records = list(pycran.parse(data, compact=True))
+    assert all(isinstance(record, PackageRecord) for record in records)
+    assert records == list(pycran.parse(data))
+
+    record = pycran.decode("Package: abc\nVersion: 2.1\nTitle: ABC", compact=True)
+    assert record["Package"] == "abc"
+    assert record["Title"] == "ABC"
+    assert record.get("Depends") is None
+    assert "Depends" not in record
+    assert len(record) == 3
+    assert dict(record) == {"Package": "abc", "Version": "2.1", "Title": "ABC"}
+    with pytest.raises(KeyError):
+        record["Imports"]
+
+    with pytest.raises(AttributeError):
+        record.Package = "def"  # type: ignore
+
+
+def test_package_table_filters_and_projects_columns():
+    with open(path.join(data_path, "PACKAGES_MIX.txt")) as fp:
+        packages = list(pycran.parse(fp.read()))
+
+    table = pycran.PackageTable.from_packages(packages)
+    assert len(table) == 3
+    assert list(table) == packages
+    assert table[2] == packages[2]
+    assert table.column("Package") == ["A3", "A8", "aaSEA"]
+    assert table.column("Imports") == [None, None, packages[2]["Imports"]]
+
+    mask = table.match("License", r"GPL") & ~table.eq("Package", "A8")
+    assert mask == b"\x01\x00\x01"
+    assert mask.count() == 2
+    assert table.present("Imports") | table.isin("Package", {"A3"}) == mask
+
+    selected = table.filter(mask).select("Package", "Version")
+    assert list(selected) == [
+        {"Package": "A3", "Version": "1.0.0"},
+        {"Package": "aaSEA", "Version": "1.1.0"},
+    ]
+
+
+def test_package_table_filters_compare_whole_values():
+    values = ["ab", "", None, "b", "bab", "ab", "a", None, "ba"]
+    packages = [{} if value is None else {"Name": value} for value in values]
+    table = pycran.PackageTable.from_packages(packages)
+
+    def expected(test):
+        return bytes(value is not None and test(value) for value in values)
+
+    for value in ["ab", "b", "ba", "", "bb", "abab"]:
+        assert table.eq("Name", value) == expected(value.__eq__)
+
+    for options in [{"ab", "", "x"}, {"a", "b"}, set(map(str, range(20))) | {"b"}]:
+        assert table.isin("Name", options) == expected(options.__contains__)
+
+    assert table.match("Name", r"^b") == expected(lambda value: value[:1] == "b")
+    assert table.match("Name", r"^$") == expected(lambda value: value == "")
+    assert table.eq("Missing", "ab") == table.isin("Missing", {"ab"}) == bytes(9)
+
+
+def test_package_table_exports_numpy_arrays():
+    numpy = pytest.importorskip("numpy")
+    with open(path.join(data_path, "PACKAGES_MIX.txt")) as fp:
+        table = pycran.PackageTable.from_packages(pycran.parse(fp.read()))
+
+    arrays = table.to_numpy()
+    assert isinstance(arrays["Package"], numpy.ndarray)
+    assert list(arrays["Imports"][:2]) == [None, None]
+
+
+def test_package_index_looks_up_single_records(tmp_path):
+    source = str(tmp_path / "PACKAGES")
+    shutil.copy(path.join(data_path, "PACKAGES_MIX.txt"), source)
+    with open(source) as fp:
+        packages = list(pycran.parse(fp.read()))
+
+    with PackageIndex(source) as index:
+        assert len(index) == 3
+        assert list(index.names()) == ["A3", "A8", "aaSEA"]
+        assert index.lookup("aaSEA") == packages[2]
+        assert index.lookup("missing") is None
+        assert "A8" in index
+
+    assert sorted(file.name for file in tmp_path.iterdir()) == [
+        "PACKAGES",
+        "PACKAGES.idx",
+    ]
+
+    # index is rebuilt once the source changes
+    with open(source, "a") as fp:
+        fp.write("\nPackage: zoo\nVersion: 1.0\n")
+
+    with PackageIndex(source) as index:
+        assert index.lookup_all("zoo") == [{"Package": "zoo", "Version": "1.0"}]
+
+
+def test_package_index_raises_exception_on_invalid_sidecar(tmp_path):
+    source = str(tmp_path / "PACKAGES")
+    shutil.copy(path.join(data_path, "PACKAGES_MIX.txt"), source)
+    sidecar = str(tmp_path / "PACKAGES.bad")
+    with open(sidecar, "wb") as fp:
+        fp.write(b"x" * 64)
+
+    with pytest.raises(IndexFormatError):
+        PackageIndex(source, sidecar)
+
+
+def test_incremental_diff_reports_changed_stanzas_only():
+    previous = b"""Package: abc
+Version: 2.1
+
+Package: abc.data
+Version: 1.0
+
+Package: abbyyR
+Version: 0.5.5
+"""
+    current = b"""Package: abc
+Version: 2.2
+
+Package: abbyyR
+Version: 0.5.5
+
+Package: zoo
+Version: 1.0
+"""
+    fingerprints = fingerprint(previous)
+    assert sorted(fingerprints) == ["abbyyR", "abc", "abc.data"]
+
+    result = diff(current, fingerprints)
+    assert result.added == [{"Package": "zoo", "Version": "1.0"}]
+    assert result.changed == [{"Package": "abc", "Version": "2.2"}]
+    assert result.removed == ["abc.data"]
+    assert result.fingerprints == fingerprint(current)
+
+    assert diff(current, result.fingerprints) == ([], [], [], result.fingerprints)
+
+    # names are found as `pycran.parse` finds them and duplicates are kept
+    duplicated = b"Package : abc\nVersion: 2.2\n\n  Package: zoo\n\n" + current
+    fingerprints = fingerprint(duplicated)
+    assert [len(fingerprints[name]) for name in ("abc", "abbyyR", "zoo")] == [2, 1, 2]
+    result = diff(current, fingerprints)
+    assert result == ([], [], [], fingerprint(current))
+    assert diff(duplicated, result.fingerprints).fingerprints == fingerprints
+
+
+def test_parse_dependencies_returns_constraints():
+    assert parse_dependencies("R (>= 2.15.0), xtable,  pbapply ,") == (
+        Dependency("R", ">=", "2.15.0"),
+        Dependency("xtable"),
+        Dependency("pbapply"),
+    )
+    assert parse_dependencies("DT(>= 0.4), seqinr(>= 3.4-5)") == (
+        Dependency("DT", ">=", "0.4"),
+        Dependency("seqinr", ">=", "3.4-5"),
+    )
+    assert parse_dependencies("") == ()
+    with pytest.raises(ValueError):
+        parse_dependencies("abc (~ 1.0)")
+
+
+def test_compare_versions_like_r():
+    assert compare_versions("1.0-2", "1.0.2") == 0
+    assert compare_versions("1.10", "1.9") > 0
+    assert compare_versions("2.3", "2.3.0") < 0
+    assert compare_versions("0.4", "0.4") == 0
+
+
+def test_check_dependencies_reports_unsatisfied_constraints():
+    packages = [
+        {
+            "Package": "abc",
+            "Version": "2.1",
+            "Depends": "R (>= 3.5), abc.data (>= 1.1)",
+        },
+        {"Package": "abc.data", "Version": "1.0", "Imports": "stats, nnet"},
+    ]
+    assert check_dependencies(packages, {"R": "4.0.0"}) == [
+        ("abc", "Depends", Dependency("abc.data", ">=", "1.1"), "1.0"),
+        ("abc.data", "Imports", Dependency("nnet"), None),
+    ]
+    assert check_dependencies(packages, {"R": "3.4.4", "nnet": "7.3"}) == [
+        ("abc", "Depends", Dependency("R", ">=", "3.5"), "3.4.4"),
+        ("abc", "Depends", Dependency("abc.data", ">=", "1.1"), "1.0"),
+    ]
+
+    # malformed fields of archived packages do not stop the check
+    packages.append(
+        {"Package": "old", "Version": "0.1", "Depends": "R (>= 3.0.0) methods, abc"}
+    )
+    assert check_dependencies(packages, {"R": "4.0.0", "nnet": "7.3"}) == [
+        ("abc", "Depends", Dependency("abc.data", ">=", "1.1"), "1.0"),
+        ("old", "Depends", Dependency("R (>= 3.0.0) methods"), None),
+    ]
+    assert check_dependencies([{"Version": "1", "Depends": "foo"}]) == []
+
+
+def test_dependency_graph_queries():
+    graph = DependencyGraph.from_packages(
+        [
+            {"Package": "app", "Depends": "R (>= 3.5), web", "Suggests": "docs"},
+            {"Package": "web", "Imports": "json, stats", "LinkingTo": "cpp"},
+            {"Package": "json", "LinkingTo": "cpp"},
+            {"Package": "cpp"},
+            {"Package": "docs", "Suggests": "app"},
+        ]
+    )
+    assert len(graph) == 5
+    assert graph.edge_count == 6
+    assert graph.dependencies("app") == ["web"]
+    assert graph.dependencies("app", recursive=True) == ["web", "json", "cpp"]
+    assert graph.reverse_dependencies("cpp") == ["web", "json"]
+    assert graph.reverse_dependencies("cpp", recursive=True) == ["web", "json", "app"]
+    assert graph.reverse_dependencies("app", kinds=SUGGESTS) == ["docs"]
+    assert graph.closure(["web"]) == ["web", "json", "cpp"]
+    assert graph.install_order(["app"]) == ["cpp", "json", "web", "app"]
+    assert graph.closure(["web", "json", "web"]) == ["web", "json", "cpp"]
+    assert graph.install_order(["web", "web"]) == ["cpp", "json", "web"]
+    assert graph.install_order() == ["cpp", "docs", "json", "web", "app"]
+
+    with pytest.raises(DependencyCycle):
+        graph.install_order(kinds=SUGGESTS)
+
+    with pytest.raises(KeyError):
+        graph.dependencies("missing")
+
+    graph = DependencyGraph.from_packages(
+        [{"Package": "old", "Depends": "R (>= 3.0.0) methods, web"}, {"Package": "web"}]
+    )
+    assert graph.dependencies("old") == ["web"]
+
+
+@pytest.mark.parametrize("strict", [False, True])
+def test_parse_buffer_matches_line_parser(strict, tmp_path):
+    data = (
+        b"Package: a\r\nTitle: x: y\r\n  more\r\n\r\n  text\rVersion: 1\n"
+        b"\n\xc2\xa0\nPackage: b\nDescription:\n\tline\x0cfeed\n  \nNote: \xc3\xbc\n"
+        b"Package: c\n    Version: 2"
+    )
+    lines = [line.decode() for line in data.splitlines()]
+    expected = list(parse_records(lines, strict))
+    assert list(pycran.parse(data, strict=strict)) == expected
+    assert list(parse_buffer(memoryview(data), strict=strict)) == expected
+    assert list(pycran.parse(memoryview(data), strict=strict)) == expected
+    compressed = memoryview(gzip.compress(data))
+    assert list(pycran.parse(compressed, strict=strict)) == expected
+    assert list(pycran.parse(compressed, strict=strict, lazy=True)) == list(
+        pycran.parse(data, strict=strict, lazy=True)
+    )
+
+    filename = tmp_path / "PACKAGES"
+    filename.write_bytes(data)
+    with open(filename, "rb") as fp:
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            packages = list(parse_buffer(buffer, strict=strict, lazy=True))
+            assert packages == expected
+
+            [package, *_rest] = packages
+            assert isinstance(package, LazyRecord)
+            assert package["Title"] is package["Title"]
+            assert "Title" in package and "Missing" not in package
+            assert pickle.loads(pickle.dumps(package)) == expected[0]
+            with pytest.raises(AttributeError):
+                package.Title = "changed"
+
+
+@pytest.mark.parametrize("strict", [False, True])
+def test_parse_lazy_matches_parse(strict, tmp_path):
+    data = (
+        b"Package: a\r\nDescription: first\r\n  See: field\r\n\r\n  \t\r\n"
+        b"Package: b\nDepends: R (>= 3.5),\n\tutils\nTitle:\n  x\n \xc2\xa0\n  y\n\n"
+        b"Package : c\n  Version: 2\nwrapped\n"
+    )
+    expected = list(pycran.parse(data, strict=strict))
+    packages = list(pycran.parse(data, strict=strict, lazy=True))
+    assert packages == expected
+    assert all(isinstance(package, LazyRecord) for package in packages)
+    assert list(pycran.parse(gzip.compress(data), strict=strict, lazy=True)) == expected
+
+    text = data.decode()
+    assert list(pycran.parse(text, strict=strict, lazy=True)) == list(
+        pycran.parse(text, strict=strict)
+    )
+
+    # windows end at lines which are not continued
+    chunks = iter([data[i : i + 5] for i in range(0, len(data), 5)])
+    texts = decode_windows(chunks, size=8)
+    assert list(map(LazyRecord, parse_text(texts, strict))) == expected
+
+    filename = tmp_path / "PACKAGES.gz"
+    filename.write_bytes(gzip.compress(data))
+    assert list(pycran.load(str(filename), strict=strict, lazy=True)) == expected
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+@pytest.mark.parametrize("strict", [False, True])
+def test_parse_selects_fields_and_packages(strict, lazy):
+    with ZipFile(path.join(data_path, "PACKAGES.txt.zip")) as archive:
+        with archive.open("PACKAGES.txt") as fp:
+            data = fp.read()
+
+    packages = list(pycran.parse(data, strict=strict))
+    selected = list(
+        pycran.parse(data, strict=strict, lazy=lazy, fields=["Package", "Version"])
+    )
+    assert selected == [
+        {"Package": package["Package"], "Version": package["Version"]}
+        for package in packages
+    ]
+
+    names = {packages[0]["Package"], packages[-1]["Package"], "missing"}
+    where = {"Package": names, "License": lambda value: "GPL" in value}
+    expected = [
+        package
+        for package in packages
+        if package["Package"] in names and "GPL" in package["License"]
+    ]
+    assert list(pycran.parse(data, strict=strict, lazy=lazy, where=where)) == expected
+
+    text = "Package: a\nDescription: one\n  two\nPackage: b\nNeedsCompilation: yes\n"
+    where = {"NeedsCompilation": "yes"}
+    assert list(pycran.parse(text, lazy=lazy, fields=["Package"], where=where)) == [
+        {"Package": "b"}
+    ]
+
+    # in strict mode the last value of a repeated field is tested
+    text = "Package: a\nLicense: MIT\nLicense: GPL\n\nPackage: b\nLicense: GPL\n"
+    text += "License: MIT\n"
+    expected = [
+        package
+        for package in pycran.parse(text, strict=True)
+        if package["License"] == "GPL"
+    ]
+    where = {"License": "GPL"}
+    assert list(pycran.parse(text, strict=True, lazy=lazy, where=where)) == expected
+    assert expected == [{"Package": "a", "License": "GPL"}]
+
+
+@pytest.mark.skipif(speedups is None, reason="compiled parsers are not built")
+@pytest.mark.parametrize(
+    "pure, compiled",
+    [
+        (parse_lines, getattr(speedups, "parse_lines", None)),
+        (parse_stanzas, getattr(speedups, "parse_stanzas", None)),
+    ],
+)
+def test_compiled_parsers_match_pure_python(pure, compiled):
+    with ZipFile(path.join(data_path, "PACKAGES.txt.zip")) as archive:
+        with archive.open("PACKAGES.txt") as fp:
+            data = fp.read().decode()
+
+    with open(path.join(data_path, "PACKAGES_MIX.txt")) as fp:
+        mixed = fp.read()
+
+    corpora = [data.splitlines(), mixed.splitlines(True)]
+    fields = frozenset(["Package", "Version", "A"])
+    pieces = ["Package", "A", "é", ":", " ", "\t", "\n", "\r\n", "\x0c", "\u3000", "1"]
+    generator = random.Random(0)
+    for _ in range(2000):
+        text = "".join(
+            generator.choice(pieces) for _ in range(generator.randint(0, 50))
+        )
+        corpora.append(text.splitlines(generator.random() < 0.5))
+
+    for lines in corpora:
+        expected = list(pure(lines))
+        packages = list(compiled(iter(lines)))
+        assert packages == expected
+        assert [list(package) for package in packages] == [
+            list(package) for package in expected
+        ]
+        projected = [
+            {name: value for name, value in package.items() if name in fields}
+            for package in expected
+        ]
+        assert list(pure(lines, fields)) == projected
+        assert list(compiled(iter(lines), fields)) == projected
+
+    with pytest.raises(TypeError):
+        list(compiled([b"Package: A"]))
+
+
+def test_encode_many_writes_cran_package_list(tmp_path):
+    with ZipFile(path.join(data_path, "PACKAGES.txt.zip")) as archive:
+        with archive.open("PACKAGES.txt") as fp:
+            data = fp.read()
+
+    records = list(pycran.parse(data))
+    output = BytesIO()
+    assert pycran.encode_many(records, output, batch_size=100) == len(records)
+    assert output.getvalue() == data
+
+    text = StringIO()
+    pycran.encode_many([{"Package": "a", "Title": "x\n  y " * 20}], [text])
+    assert list(pycran.parse(text.getvalue())) == [
+        {"Package": "a", "Title": " ".join(["x y"] * 20)}
+    ]
+    assert max(map(len, text.getvalue().splitlines())) < 72
+
+    for mode in ("w+", "w+b"):
+        with tempfile.SpooledTemporaryFile(mode=mode) as spooled:
+            pycran.encode_many([{"Package": "a", "Version": 1}], spooled)
+            spooled.seek(0)
+            assert list(pycran.parse(spooled.read())) == [
+                {"Package": "a", "Version": "1"}
+            ]
+
+    paths = pycran.write_packages(iter(records[:1000]), str(tmp_path))
+    assert sorted(map(str, tmp_path.iterdir())) == sorted(paths)
+    for filename in paths:
+        assert list(pycran.load(filename)) == records[:1000]
+
+    with pytest.raises(ValueError):
+        pycran.write_packages(records, str(tmp_path), ["zstd"])
+
+
+def test_parse_stream_reads_compressed_file_objects():
+    with ZipFile(path.join(data_path, "PACKAGES.txt.zip")) as archive:
+        with archive.open("PACKAGES.txt") as fp:
+            data = fp.read()
+
+    stream = gzip.GzipFile(fileobj=BytesIO(gzip.compress(data)))
+    assert list(pycran.parse_stream(stream)) == list(pycran.parse(data))
+
+
+def test_parse_stream_handles_lines_split_across_chunks():
+    data = "Package: abc\r\nTitle: Ünïcode\r\nPackage: def\r\nTitle: more\r\n"
+    encoded = data.encode("utf-8")
+    chunks = [encoded[i : i + 3] for i in range(0, len(encoded), 3)]
+    expected = [
+        {"Package": "abc", "Title": "Ünïcode"},
+        {"Package": "def", "Title": "more"},
+    ]
+    assert list(pycran.parse_stream(chunks)) == expected
+    assert list(pycran.parse_stream(StringIO(data), chunk_size=5)) == expected
+
+    long = "Description: " + "x" * 5000 + "\r"
+    for text in (data, long + "\nTitle: a\r" + long):
+        for value in (text, text.encode("utf-8")):
+            for size in (1, 2, 7):
+                splitter = LineSplitter()
+                lines = []
+                for i in range(0, len(value), size):
+                    lines.extend(splitter.feed(value[i : i + size]))
+                lines.extend(splitter.close())
+                assert lines == text.splitlines(True)
+
+
+@pytest.mark.parametrize(
+    "compress",
+    [
+        gzip.compress,
+        bz2.compress,
+        lzma.compress,
+        lambda data: gzip.compress(data[:1000]) + gzip.compress(data[1000:]),
+        lambda data: b"".join(compress_blocks([data])),
+    ],
+)
+def test_parse_detects_compressed_data(compress, tmp_path):
+    with open(path.join(data_path, "PACKAGES_MIX.txt"), "rb") as fp:
+        data = fp.read()
+
+    expected = list(pycran.parse(data))
+    compressed = compress(data)
+    chunks = [compressed[i : i + 3] for i in range(0, len(compressed), 3)]
+    filename = tmp_path / "PACKAGES.gz"
+    filename.write_bytes(compressed)
+    assert list(pycran.parse(compressed)) == expected
+    assert list(pycran.parse_stream(chunks)) == expected
+    assert list(pycran.load(str(filename))) == expected
+
+    # streams holding no data at all are detected too
+    assert list(pycran.parse(compress(b""))) == []
+    assert list(pycran.parse(compress(b"") + compressed)) == expected
+
+
+@pytest.mark.parametrize(
+    "compress",
+    [
+        gzip.compress,
+        bz2.compress,
+        lzma.compress,
+        lambda data: b"".join(compress_blocks([data])),
+    ],
+)
+def test_parse_raises_error_on_truncated_compressed_data(compress, tmp_path):
+    with open(path.join(data_path, "PACKAGES_MIX.txt"), "rb") as fp:
+        compressed = compress(fp.read())
+
+    truncated = compressed[: len(compressed) // 2]
+    filename = tmp_path / "PACKAGES.gz"
+    filename.write_bytes(truncated)
+    with pytest.raises(EOFError):
+        list(pycran.parse(truncated))
+    with pytest.raises(EOFError):
+        list(pycran.parse(truncated, lazy=True))
+    with pytest.raises(EOFError):
+        list(pycran.parse_stream([truncated]))
+    with pytest.raises(EOFError):
+        list(pycran.load(str(filename)))
+
+
+def test_load_reads_zip_and_parallel_gzip_members(tmp_path):
+    with ZipFile(path.join(data_path, "PACKAGES.txt.zip")) as archive:
+        with archive.open("PACKAGES.txt") as fp:
+            data = fp.read()
+
+    expected = list(pycran.parse(data))
+    assert list(pycran.load(path.join(data_path, "PACKAGES.txt.zip"))) == expected
+
+    blocks = b"".join(compress_blocks([data]))
+    assert gzip.decompress(blocks) == data
+    assert b"".join(decompress(blocks, workers=4, batch_size=2)) == data
+    assert detect_compression(data[:MAGIC_SIZE]) is None
+
+
+def test_parse_parallel_matches_parse():
+    with ZipFile(path.join(data_path, "PACKAGES.txt.zip")) as archive:
+        with archive.open("PACKAGES.txt") as fp:
+            data = fp.read()
+
+    data = data[:200000]
+    for strict in (False, True):
+        expected = list(pycran.parse(data, strict=strict))
+        packages = pycran.parse_parallel(
+            data, workers=2, strict=strict, shard_size=20000
+        )
+        assert list(packages) == expected
+
+    compact = list(pycran.parse_parallel(data.decode(), workers=2, compact=True))
+    assert compact == expected
+
+    packages = pycran.parse_parallel(memoryview(gzip.compress(data)), workers=2)
+    assert list(packages) == expected
+
+
+def test_parse_parallel_falls_back_to_parse(monkeypatch):
+    def executor(*args, **kwargs):
+        raise AssertionError("process pool is not needed")
+
+    monkeypatch.setattr(pycran.parallel, "ProcessPoolExecutor", executor)
+    data = b"Package: a\nVersion: 1\n\nPackage: b\nVersion: 2\n"
+    expected = list(pycran.parse(data))
+    assert list(pycran.parse_parallel(data, workers=1)) == expected
+    assert list(pycran.parse_parallel(gzip.compress(data), workers=4)) == expected
+
+    monkeypatch.setattr("os.cpu_count", lambda: 1)
+    assert list(pycran.parse_parallel(data, shard_size=1)) == expected
+
+
+def test_parse_parallel_continues_packages_across_shards():
+    # the first stanza misses `Package` field so the default parser
+    # joins it with the next one regardless of the blank line
+    data = "Version: 1\n\nPackage: a\nTitle: A\n\nPackage: b\nVersion: 2\n\n" * 3
+    packages = pycran.parse_parallel(data, workers=2, shard_size=1)
+    assert list(packages) == list(pycran.parse(data))
+    assert len(shard_spans(data.encode(), 1)) == 7
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def _collect(packages):
+    return [package async for package in packages]
+
+
+def test_parse_async_parses_chunks_as_they_arrive():
+    with open(path.join(data_path, "PACKAGES_MIX.txt"), "rb") as fp:
+        data = fp.read()
+
+    async def chunks():
+        for i in range(0, len(data), 7):
+            await asyncio.sleep(0)
+            yield data[i : i + 7]
+
+    expected = list(pycran.parse(data))
+    assert _run(_collect(parse_async(chunks()))) == expected
+    assert _run(_collect(parse_async(chunks(), compact=True))) == expected
+
+    plain = data
+    for compress in (gzip.compress, bz2.compress):
+        data = compress(plain * 2) + compress(b"")
+        assert _run(_collect(parse_async(chunks()))) == expected * 2
+
+
+def test_fetch_many_uses_pluggable_transport():
+    with open(path.join(data_path, "PACKAGES_MIX.txt"), "rb") as fp:
+        data = fp.read()
+
+    async def transport(url):
+        if url.endswith("missing"):
+            raise FetchError(f"Failed to fetch {url}, status 404.")
+        yield data
+
+    results = _run(
+        fetch_many(["mirror/PACKAGES", "mirror/missing"], transport, compact=True)
+    )
+    assert results["mirror/PACKAGES"] == list(pycran.parse(data))
+    assert isinstance(results["mirror/missing"], FetchError)
+
+
+def test_fetch_streams_from_http_server():
+    with open(path.join(data_path, "PACKAGES_MIX.txt"), "rb") as fp:
+        data = fp.read()
+
+    async def handle(reader, writer):
+        request = await reader.readuntil(b"\r\n\r\n")
+        if request.startswith(b"GET /old "):
+            writer.write(b"HTTP/1.1 301 Moved\r\nLocation: /PACKAGES\r\n\r\n")
+        else:
+            writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n")
+            for i in range(0, len(data), 100):
+                chunk = data[i : i + 100]
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        writer.close()
+
+    async def main():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            return await _collect(fetch(f"http://127.0.0.1:{port}/old"))
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    assert _run(main()) == list(pycran.parse(data))
+
+
+def test_http_transport_times_out_on_stalled_server():
+    async def main():
+        closed = asyncio.Event()
+
+        async def handle(reader, writer):
+            # never answers and waits for the client to give up
+            await reader.read()
+            writer.close()
+            closed.set()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            url = f"http://127.0.0.1:{port}/PACKAGES"
+            return await _collect(http_transport(url, timeout=0.1))
+        finally:
+            await closed.wait()
+            server.close()
+            await server.wait_closed()
+
+    with pytest.raises(FetchError, match="Timed out"):
+        _run(main())
+
+
 def test_encode():
     metadata = """
     Package: ABACUS
@@ -359,6 +1109,184 @@ def test_from_file_tar_file_works():
     }
 
 
+def test_from_file_compact_works():
+    record = pycran.from_file(path.join(data_path, "A3_1.0.0.tar.gz"), compact=True)
+    assert isinstance(record, PackageRecord)
+    assert record == pycran.from_file(path.join(data_path, "A3_1.0.0.tar.gz"))
+
+
+def test_from_file_reads_top_level_description_only(tmp_path):
+    archive = str(tmp_path / "abc_1.0.tar.gz")
+    with tarfile.open(archive, "w:gz") as tar:
+        for name, data in [
+            ("abc/inst/DESCRIPTION.old", b"Package: old"),
+            ("abc/vignettes/DESCRIPTION", b"Package: vignette"),
+            ("abc/DESCRIPTION", b"Package: abc\nVersion: 1.0"),
+            ("abc/src/vendor.c", b"int main() {}"),
+        ]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, BytesIO(data))
+
+    assert pycran.from_file(archive) == {"Package": "abc", "Version": "1.0"}
+
+    # members after description file are never read
+    tar = tarfile.open(archive)
+    pycran.from_file(tar)
+    assert [info.name for info in tar.members][-1] == "abc/DESCRIPTION"
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_parse_decodes_stanzas_with_declared_encoding(lazy, tmp_path):
+    latin = "Package: café\nEncoding: latin1\nAuthor: José,\n  Müller\n"
+    utf = "Package: abc\nAuthor: Åse\n"
+    data = utf.encode() + b"\n" + latin.encode("latin1") + b"\n" + utf.encode()
+    expected = list(pycran.parse(f"{utf}\n{latin}\n{utf}"))
+    assert expected[1]["Author"] == "José, Müller"
+    assert list(pycran.parse(data, lazy=lazy)) == expected
+    assert list(pycran.parse(memoryview(data), lazy=lazy)) == expected
+    assert list(pycran.parse(gzip.compress(data), lazy=lazy)) == expected
+    assert list(pycran.parse_stream(BytesIO(data), chunk_size=7)) == expected
+    assert list(pycran.parse_stream([bz2.compress(data)])) == expected
+    for name, content in (("PACKAGES", data), ("PACKAGES.gz", gzip.compress(data))):
+        (tmp_path / name).write_bytes(content)
+        assert list(pycran.load(str(tmp_path / name), lazy=lazy)) == expected
+
+    archive = str(tmp_path / "cafe_1.0.tar.gz")
+    with tarfile.open(archive, "w:gz") as tar:
+        info = tarfile.TarInfo("cafe/DESCRIPTION")
+        info.size = len(latin.encode("latin1"))
+        tar.addfile(info, BytesIO(latin.encode("latin1")))
+
+    assert pycran.from_file(archive) == expected[1]
+
+    with pytest.raises(UnicodeDecodeError):
+        list(pycran.parse(b"Package: abc\nAuthor: Jos\xe9\n", lazy=lazy))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_from_files_captures_errors_per_file(workers):
+    paths = [
+        path.join(data_path, name)
+        for name in ["A3_1.0.0.tar.gz", "A3_no_description.tar.gz", "PACKAGES_MIX.txt"]
+    ]
+    results = list(from_files(paths * 3, workers=workers, chunk_size=2, ordered=True))
+    assert [result_path for result_path, _ in results] == paths * 3
+
+    metadata, missing, invalid = [result for _, result in results[:3]]
+    assert metadata == pycran.from_file(paths[0])
+    assert isinstance(missing, DescriptionNotFound)
+    assert isinstance(invalid, NotTarFile)
+
+
+def test_scan_directory_loads_all_archives():
+    results = dict(scan_directory(data_path, workers=2))
+    assert sorted(results) == [
+        path.join(data_path, "A3_1.0.0.tar.gz"),
+        path.join(data_path, "A3_no_description.tar.gz"),
+    ]
+    assert results[path.join(data_path, "A3_1.0.0.tar.gz")]["Package"] == "A3"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_decode_many_matches_decode(workers):
+    with open(path.join(data_path, "PACKAGES_MIX.txt"), "rb") as fp:
+        data = fp.read()
+
+    blobs = [data, data.decode(), b"", gzip.compress(data), b"A: 1\x0c\nB: 2\r3"]
+    results = decode_many(blobs + [b"\xff: 1", None], workers, chunk_size=2)
+    assert results[: len(blobs)] == [pycran.decode(blob) for blob in blobs]
+    assert isinstance(results[-2], UnicodeDecodeError)
+    assert isinstance(results[-1], TypeError)
+
+    [record] = decode_many([data], compact=True)
+    assert isinstance(record, PackageRecord) and record == pycran.decode(data)
+
+
+def test_metadata_cache_reuses_parsed_archives(tmp_path, monkeypatch):
+    calls = []
+
+    def from_file(archive):
+        calls.append(archive)
+        return pycran.from_file(archive)
+
+    monkeypatch.setattr(pycran.cache, "from_file", from_file)
+    archive = str(tmp_path / "A3_1.0.0.tar.gz")
+    shutil.copy(path.join(data_path, "A3_1.0.0.tar.gz"), archive)
+    expected = pycran.from_file(archive)
+
+    with MetadataCache(str(tmp_path / "cache.sqlite")) as cache:
+        assert cache.from_file(archive) == expected
+        assert cache.from_file(archive, compact=True) == expected
+        assert len(calls) == 1
+
+        md5 = file_md5(archive)
+        assert cache.from_file(archive, by_content=True) == expected
+        assert len(calls) == 2
+
+        cache.invalidate(archive)
+        assert len(cache) == 0
+        assert cache.from_file(archive) == expected
+        assert len(calls) == 3
+
+    # cache survives reopening and checksum keys survive moving archives
+    moved = str(tmp_path / "moved.tar.gz")
+    cache = MetadataCache(str(tmp_path / "cache.sqlite"))
+    cache.from_file(archive, md5=md5)
+    shutil.move(archive, moved)
+    with cache:
+        assert cache.from_file(moved, md5=md5.upper()) == expected
+        assert len(calls) == 4
+
+
+def test_metadata_cache_evicts_least_recently_used_entries(tmp_path):
+    archive = path.join(data_path, "A3_1.0.0.tar.gz")
+    with MetadataCache(str(tmp_path / "cache.sqlite"), max_entries=2) as cache:
+        for md5 in ["a", "b", "a", "c"]:
+            cache.from_file(archive, md5=md5)
+
+        assert len(cache) == 2
+        assert cache.get(cache.key(archive, "b")) is None
+        assert cache.get(cache.key(archive, "a")) is not None
+
+
+def test_snapshot_maps_parsed_packages(tmp_path):
+    with open(path.join(data_path, "PACKAGES_MIX.txt"), "rb") as fp:
+        packages = list(pycran.parse(fp.read()))
+    packages.append({"Package": packages[0]["Package"], "Version": "0.1"})
+    packages.append({"Title": "No name"})
+
+    snapshot_path = write_snapshot(packages, str(tmp_path / "packages.snapshot"))
+    with Snapshot(snapshot_path) as snapshot:
+        assert len(snapshot) == len(packages)
+        assert [list(record.items()) for record in snapshot] == [
+            list(package.items()) for package in packages
+        ]
+        assert snapshot[-1] == packages[-1]
+        assert list(snapshot.names()) == [
+            package["Package"] for package in packages[:-1]
+        ]
+
+        record = snapshot.lookup(packages[0]["Package"])
+        assert isinstance(record, SnapshotRecord) and record == packages[0]
+        assert snapshot.lookup_all(packages[0]["Package"])[1]["Version"] == "0.1"
+        assert snapshot.lookup("missing") is None and "missing" not in snapshot
+        assert pickle.loads(pickle.dumps(record)) == packages[0]
+
+    # a failed write leaves no temporary file behind
+    (tmp_path / "taken").mkdir()
+    with pytest.raises(OSError):
+        write_snapshot(packages, str(tmp_path / "taken"))
+    assert sorted(item.name for item in tmp_path.iterdir()) == [
+        "packages.snapshot",
+        "taken",
+    ]
+
+    (tmp_path / "broken.snapshot").write_bytes(b"PYCRANSS" + bytes(32))
+    with pytest.raises(IndexFormatError):
+        Snapshot(str(tmp_path / "broken.snapshot"))
+
+
 def test_from_file_path_raises_exception_if_description_not_found():
     with pytest.raises(DescriptionNotFound):
         pycran.from_file(path.join(data_path, "A3_no_description.tar.gz"))
@@ -379,6 +1307,36 @@ def test_from_file_path_raises_exception_if_file_is_not_tarfile():
         pycran.from_file(path.join(data_path, "PACKAGES_MIX.txt"))
 
 
+@pytest.mark.parametrize("lazy", [False, True])
+def test_observe_reports_stages_and_counters(lazy):
+    data = b"Package: A\nDepends: x,\n  y\n\nPackage: B\nVersion: 1\n"
+    events = []
+
+    class Recorder(Observer):
+        def count(self, counter, value):
+            events.append((counter, value))
+
+    with observe() as metrics, observe(Recorder()):
+        assert len(list(pycran.parse(data, lazy=lazy))) == 2
+        pycran.from_file(path.join(data_path, "A3_1.0.0.tar.gz"))
+        with pytest.raises(DescriptionNotFound):
+            pycran.from_file(path.join(data_path, "A3_no_description.tar.gz"))
+
+    assert not observers
+    assert isinstance(metrics, Metrics)
+    assert metrics.counters["records"] == 3
+    assert metrics.counters["continuation_lines"] == 2
+    assert metrics.counters["errors"] == 1
+    assert metrics.counters["bytes_read"] == len(
+        pycran.util.read_description(path.join(data_path, "A3_1.0.0.tar.gz"))
+    )
+    assert metrics.calls["from_file"] == 2
+    assert metrics.calls["find_description"] == 2
+    assert metrics.calls["read_description"] == 1
+    assert {"parse", "decode"} <= set(metrics.timings)
+    assert ("records", 2) in events
+
+
 # Cross validation tests to check if parsing is valid and correct
 # we will use `deb-pkg-tools` package to parse and test matches
 # NOTE: our parser intentionally strips whitespaces and